@@ -1,15 +1,47 @@
+import os
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from config import Config
+from .replica import RoutingSession
 
-app = Flask(__name__)
-app.config.from_object(Config)
+db=SQLAlchemy(session_options={'class_': RoutingSession})
 
-CORS(app)
 
-db=SQLAlchemy(app)
-migrate = Migrate(app,db)
+def create_app(config=Config):
+    app = Flask(__name__)
+    app.config.from_object(config)
 
-from . import routes, models
\ No newline at end of file
+    if app.config['TRUSTED_PROXIES']:
+        proxies = app.config['TRUSTED_PROXIES']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies)
+
+    CORS(app)
+    db.init_app(app)
+
+    from . import models, routes, commands, replica, profiling, admission, ratelimit, writebehind, snapshot
+    app.register_blueprint(routes.bp)
+    app.register_blueprint(commands.bp)
+    replica.init_app(app)
+    profiling.init_app(app)
+    admission.init_app(app)
+    ratelimit.init_app(app)
+    writebehind.init_app(app)
+    snapshot.init_app(app)
+
+    # Alembic is only needed for `flask db ...`; web workers skip importing it.
+    if os.environ.get('FLASK_RUN_FROM_CLI') == 'true':
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
+    return app
+
+
+def dispose_engines(app):
+    """Drop pooled connections inherited from a parent process. Called in
+    forked workers (see gunicorn.conf.py) so no socket is shared between
+    processes; close=False leaves the parent's connections alone."""
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
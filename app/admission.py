@@ -0,0 +1,111 @@
+import threading
+import time
+from flask import current_app, g, request
+from .auth import token_auth
+
+# Endpoint -> admission group. Any other non-GET request falls in "writes";
+# endpoints in no group are never limited. "auth" holds the password-hashing
+# endpoints, so cheap token-authenticated reads must not share it.
+ENDPOINT_GROUPS = {
+    'api.get_recipes': 'listing',
+    'api.get_ingredients': 'listing',
+    'api.get_instruction': 'listing',
+    'api.get_saves': 'listing',
+    'api.get_cuisines': 'listing',
+    'api.get_similar_recipes': 'listing',
+    'api.get_shopping_list': 'listing',
+    'api.get_recipe': 'detail',
+    'api.get_write': 'detail',
+    'api.get_me': 'detail',
+    'api.create_user': 'auth',
+    'api.get_token': 'auth',
+    'api.create_users_bulk': 'auth',
+}
+
+
+class ConcurrencyLimiter:
+    """Admits up to `limit` concurrent requests. Up to `queue_size` more may wait
+    for at most `timeout` seconds; anything beyond that is refused at once.
+    Priority waiters get freed slots ahead of ordinary ones."""
+
+    def __init__(self, limit, queue_size, timeout):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = {False: 0, True: 0}
+        self._cond = threading.Condition()
+
+    def _can_run(self, priority):
+        return self.active < self.limit and (priority or not self.waiting[True])
+
+    def acquire(self, priority=False):
+        with self._cond:
+            if self._can_run(priority):
+                self.active += 1
+                return True
+            if self.waiting[priority] >= self.queue_size:
+                return False
+            self.waiting[priority] += 1
+            deadline = time.monotonic() + self.timeout
+            try:
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                    if self._can_run(priority):
+                        self.active += 1
+                        return True
+            finally:
+                self.waiting[priority] -= 1
+                if priority:
+                    self._cond.notify_all()
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+
+def endpoint_group():
+    group = ENDPOINT_GROUPS.get(request.endpoint)
+    if group is None and request.method not in ('GET', 'HEAD', 'OPTIONS'):
+        group = 'writes'
+    return group
+
+
+def has_priority():
+    # Authenticated writes jump the queue. The token is looked up here (one
+    # indexed match on its hash), so a made-up Authorization header gets none.
+    if request.method in ('GET', 'HEAD', 'OPTIONS') or 'Authorization' not in request.headers:
+        return False
+    auth = token_auth.get_auth()
+    return auth is not None and token_auth.authenticate(auth, None) is not None
+
+
+def admit():
+    limiter = current_app.extensions['admission'].get(endpoint_group())
+    if limiter is None:
+        return None
+    if not limiter.acquire(has_priority()):
+        retry_after = str(current_app.config['ADMISSION_RETRY_AFTER'])
+        return {'error': 'The server is busy. Please try again shortly.'}, 503, {'Retry-After': retry_after}
+    g.admission_limiter = limiter
+
+
+def leave(exc):
+    limiter = g.pop('admission_limiter', None)
+    if limiter is not None:
+        limiter.release()
+
+
+def init_app(app):
+    if not app.config['ADMISSION_CONTROL']:
+        return
+    app.extensions['admission'] = {
+        group: ConcurrencyLimiter(limit, queue_size, app.config['ADMISSION_TIMEOUT'])
+        for group, (limit, queue_size) in app.config['ADMISSION_LIMITS'].items()
+    }
+    app.before_request(admit)
+    app.teardown_request(leave)
@@ -1,5 +1,5 @@
 from flask_httpauth import HTTPBasicAuth, HTTPTokenAuth
-from .models import User
+from .models import User, AuthToken
 from . import db
 from datetime import datetime, timezone
 
@@ -20,10 +20,12 @@ def handle_error(status_code):
 
 @token_auth.verify_token
 def verify(token):
-    user=db.session.execute(db.select(User).where(User.token==token)).scalar_one_or_none()
-    if user is not None and user.token_expiration > datetime.now(timezone.utc):
-        return user
-    return None
+    if not token:
+        return None
+    return db.session.execute(
+        db.select(User).join(AuthToken)
+        .where((AuthToken.token_hash == AuthToken.hash(token)) & (AuthToken.expires_at > datetime.now(timezone.utc)))
+    ).scalar_one_or_none()
 
 @token_auth.error_handler
 def handle_error(status_code):
@@ -0,0 +1,51 @@
+import click
+from flask import Blueprint, current_app
+from .models import AuthToken
+
+bp = Blueprint('commands', __name__, cli_group=None)
+
+
+@bp.cli.command('purge-tokens')
+@click.option('--chunk-size', default=1000, show_default=True, help='Tokens deleted per transaction.')
+def purge_tokens(chunk_size):
+    """Delete expired auth tokens. Meant to be run periodically from cron."""
+    deleted = AuthToken.purge_expired(chunk_size)
+    click.echo(f'Deleted {deleted} expired tokens.')
+
+
+@bp.cli.command('build-similar')
+@click.option('--recipe', 'recipe_ids', type=int, multiple=True, help='Only recompute these recipes. Repeatable.')
+@click.option('--top-k', default=20, show_default=True, help='Neighbours stored per recipe.')
+@click.option('--chunk-size', default=1024, show_default=True, help='Recipes scored and committed per batch.')
+def build_similar(recipe_ids, top_k, chunk_size):
+    """Rebuild the "similar recipes" table from ingredients and saves."""
+    from .similarity import build_similarities
+    built = build_similarities(only=recipe_ids or None, top_k=top_k, chunk_size=chunk_size)
+    click.echo(f'Stored neighbours for {built} recipes.')
+
+
+@bp.cli.command('build-snapshot')
+@click.argument('path', required=False)
+def build_catalog_snapshot(path):
+    """Build the read-only recipe snapshot (defaults to SNAPSHOT_PATH)."""
+    from .snapshot import build_snapshot
+    path = path or current_app.config['SNAPSHOT_PATH']
+    if not path:
+        raise click.UsageError('Pass a path or set SNAPSHOT_PATH.')
+    count = build_snapshot(path)
+    click.echo(f'Wrote {count} recipes to {path}.')
+
+
+@bp.cli.command('import-users')
+@click.argument('file', type=click.File(encoding='utf-8-sig'))
+@click.option('--chunk-size', default=1000, show_default=True, help='Users checked, hashed and committed per batch.')
+@click.option('--workers', type=int, help='Password-hashing processes. Defaults to one per CPU.')
+def import_users(file, chunk_size, workers):
+    """Create users from a CSV file (or - for stdin) with a header row of
+    firstName, lastName, username, email and password."""
+    import csv
+    from .provisioning import import_users
+    created, skipped = import_users(csv.DictReader(file), chunk_size=chunk_size, workers=workers)
+    for username, reason in skipped:
+        click.echo(f'Skipped {username}: {reason}', err=True)
+    click.echo(f'Created {created} users, skipped {len(skipped)}.')
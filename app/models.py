@@ -1,8 +1,16 @@
 from . import db
 from datetime import datetime, timezone, timedelta
 from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.dialects import postgresql, sqlite
+import hashlib
 import secrets
 
+
+def upsert(model):
+    if db.engine.dialect.name == 'postgresql':
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     first_name = db.Column(db.String, nullable=False)
@@ -16,8 +24,7 @@ class User(db.Model):
     ingredients = db.relationship('Ingredient', back_populates = 'author')
     instructions = db.relationship('Instruction', back_populates = 'author')
     saves=db.relationship('Save', back_populates = 'author')
-    token = db.Column(db.String, index=True, unique=True)
-    token_expiration = db.Column(db.DateTime(timezone=True))
+    tokens = db.relationship('AuthToken', back_populates='user')
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -47,19 +54,58 @@ class User(db.Model):
         }
     
     def get_token(self):
-        now = datetime.now(timezone.utc)
-        if self.token and self.token_expiration > now + timedelta(minutes=1):
-            return {"token": self.token, "tokenExpiration":self.token_expiration}
-        self.token=secrets.token_hex(16)
-        self.token_expiration = now + timedelta(hours=1)
+        token = secrets.token_hex(16)
+        expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+        AuthToken(token_hash=AuthToken.hash(token), user_id=self.id, expires_at=expires_at)
+        return {"token": token, "tokenExpiration": expires_at}
+
+class AuthToken(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    token_hash = db.Column(db.String(64), nullable=False, unique=True, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    expires_at = db.Column(db.DateTime(timezone=True), nullable=False, index=True)
+    date_created = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    user = db.relationship('User', back_populates='tokens')
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
         self.save()
-        return {"token": self.token, "tokenExpiration":self.token_expiration}
+
+    def __repr__(self):
+        return f"<AuthToken {self.id}|user {self.user_id}>"
+
+    def save(self):
+        db.session.add(self)
+        db.session.commit()
+
+    @staticmethod
+    def hash(token):
+        # Tokens are random, so a fast unsalted digest is enough and keeps the
+        # lookup a single indexed equality match.
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    @classmethod
+    def purge_expired(cls, chunk_size=1000):
+        """Delete expired tokens a chunk at a time, committing after each chunk
+        so no single transaction holds locks on the whole table."""
+        now = datetime.now(timezone.utc)
+        total = 0
+        while True:
+            expired = db.select(cls.id).where(cls.expires_at <= now).limit(chunk_size)
+            result = db.session.execute(
+                db.delete(cls).where(cls.id.in_(expired.scalar_subquery())),
+                execution_options={'synchronize_session': False}
+            )
+            db.session.commit()
+            total += result.rowcount
+            if result.rowcount < chunk_size:
+                return total
 
 class Recipe(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable = False)
     description = db.Column(db.String)
-    cuisine = db.Column(db.String, nullable = False)
+    cuisine = db.Column(db.String, nullable = False, index=True)
     cookTime = db.Column(db.String, nullable=False)
     servings = db.Column(db.String)
     date_created = db.Column(db.DateTime, nullable = False, default= lambda: datetime.now(timezone.utc))
@@ -75,18 +121,18 @@ class Recipe(db.Model):
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
+        CuisineCount.adjust(self.cuisine, 1)
         self.save()
 
     def save(self):
         db.session.add(self)
         db.session.commit()
     
-    def to_dict(self):
-        saves = db.session.execute(db.select(Save).where((Save.recipe_id == self.id)))
-
-        count=0
-        for save in saves:
-            count+=1
+    def to_dict(self, saves=None):
+        # Callers serializing many recipes can pass save counts they already
+        # fetched in bulk.
+        if saves is None:
+            saves = db.session.execute(db.select(db.func.count(Save.id)).where(Save.recipe_id == self.id)).scalar()
 
         return {
             "id":self.id,
@@ -99,21 +145,46 @@ class Recipe(db.Model):
             "user_id": self.user_id,
             'author': self.author.to_dict(),
             'comments': [comment.to_dict() for comment in self.comments],
-            "saves": count
+            "saves": saves
         }
     
     def update(self, **kwargs):
         allowed_fields = {'name', 'description', "cuisine", "cookTime", "servings"}
+        old_cuisine = self.cuisine
 
         for key,value in kwargs.items():
             if key in allowed_fields:
                 setattr(self, key, value)
+        if self.cuisine != old_cuisine:
+            CuisineCount.adjust(old_cuisine, -1)
+            CuisineCount.adjust(self.cuisine, 1)
         self.save()
 
     def delete(self):
+        CuisineCount.adjust(self.cuisine, -1)
+        # The foreign keys cascade on Postgres; SQLite does not enforce them
+        # by default, so clear both sides of the neighbour table here too.
+        db.session.execute(db.delete(RecipeSimilarity).where(
+            (RecipeSimilarity.recipe_id == self.id) | (RecipeSimilarity.similar_recipe_id == self.id)
+        ))
         db.session.delete(self)
         db.session.commit()
 
+class CuisineCount(db.Model):
+    cuisine = db.Column(db.String, primary_key=True)
+    recipe_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<CuisineCount {self.cuisine}|{self.recipe_count}>"
+
+    @classmethod
+    def adjust(cls, cuisine, delta):
+        """Add `delta` to a cuisine's count in the caller's transaction, so the
+        count commits or rolls back together with the recipe change."""
+        stmt = upsert(cls).values(cuisine=cuisine, recipe_count=delta)
+        stmt = stmt.on_conflict_do_update(index_elements=['cuisine'], set_={'recipe_count': cls.recipe_count + delta})
+        db.session.execute(stmt)
+
 class Comment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     body = db.Column(db.String, nullable=False)
@@ -191,6 +262,7 @@ class Ingredient(db.Model):
         }
 
 class Instruction(db.Model):
+    __table_args__ = (db.Index('ix_instruction_recipe_id_stepNumber', 'recipe_id', 'stepNumber'),)
     id = db.Column(db.Integer, primary_key=True)
     stepNumber = db.Column(db.Integer, nullable=False)
     body = db.Column(db.String, nullable=True)
@@ -232,6 +304,7 @@ class Instruction(db.Model):
         }
     
 class Save(db.Model):
+    __table_args__ = (db.UniqueConstraint('user_id', 'recipe_id', name='uq_save_user_id_recipe_id'),)
     id = db.Column(db.Integer, primary_key=True)
     recipe_id= db.Column(db.Integer, db.ForeignKey('recipe.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -266,4 +339,38 @@ class Save(db.Model):
             "id": self.id,
             "recipe_id": self.recipe_id,
             "user_id": self.user_id
-        }
\ No newline at end of file
+        }
+
+class WriteReceipt(db.Model):
+    # Outcome of a queued write (see writebehind.py), looked up by the id its
+    # 202 response returned. row_id is the comment or save it ended up as.
+    receipt = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    recipe_id = db.Column(db.Integer, nullable=False)
+    model = db.Column(db.String, nullable=False)
+    row_id = db.Column(db.Integer)
+    status = db.Column(db.String, nullable=False)
+
+    def __repr__(self):
+        return f"<WriteReceipt {self.receipt}|{self.status}>"
+
+class DeadLetter(db.Model):
+    # A queued write (see writebehind.py) that could not be stored.
+    id = db.Column(db.Integer, primary_key=True)
+    receipt = db.Column(db.String(32), nullable=False, unique=True, index=True)
+    model = db.Column(db.String, nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    error = db.Column(db.Text, nullable=False)
+    date_created = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f"<DeadLetter {self.id}|{self.model}>"
+
+class RecipeSimilarity(db.Model):
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipe.id', ondelete='CASCADE'), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    similar_recipe_id = db.Column(db.Integer, db.ForeignKey('recipe.id', ondelete='CASCADE'), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f"<RecipeSimilarity {self.recipe_id}#{self.rank}|{self.similar_recipe_id}>"
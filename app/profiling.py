@@ -0,0 +1,108 @@
+import hmac
+import itertools
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class StackSampler:
+    """Samples the Python stack of one thread every `interval` seconds from a
+    helper thread, counting identical stacks."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({code.co_filename}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+
+    def collapsed(self):
+        """Stacks in the collapsed format read by flamegraph.pl and speedscope."""
+        return ''.join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self, limit=30):
+        total = sum(self.stacks.values())
+        own, inclusive = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for frame in set(stack):
+                inclusive[frame] += count
+        lines = [f'{total} samples every {self.interval * 1000:g} ms', '', f"{'own %':>7} {'total %':>8}  function"]
+        for frame, count in own.most_common(limit):
+            lines.append(f'{100 * count / total:7.1f} {100 * inclusive[frame] / total:8.1f}  {frame}')
+        return '\n'.join(lines) + '\n'
+
+
+class ProfilerMiddleware:
+    """WSGI middleware that profiles a request when it carries the configured
+    X-Profile token, or at random for PROFILING_SAMPLE_RATE of requests, and
+    writes a collapsed-stack file plus a top-functions summary for it.
+    Untriggered requests only pay for the trigger check."""
+
+    def __init__(self, wsgi_app, config):
+        self.wsgi_app = wsgi_app
+        self.sample_rate = config['PROFILING_SAMPLE_RATE']
+        self.token = config['PROFILING_TOKEN']
+        self.interval = config['PROFILING_INTERVAL']
+        self.output_dir = config['PROFILING_DIR']
+        # next() on itertools.count is atomic, so threads get unique numbers.
+        self._count = itertools.count(1)
+
+    def triggered(self, environ):
+        header = environ.get('HTTP_X_PROFILE')
+        # WSGI headers are latin-1 strings; compare bytes so non-ASCII input
+        # is just a mismatch rather than a TypeError.
+        if header and self.token and hmac.compare_digest(header.encode('latin-1'), self.token.encode()):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def __call__(self, environ, start_response):
+        if not self.triggered(environ):
+            return self.wsgi_app(environ, start_response)
+
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            return self.wsgi_app(environ, start_response)
+        finally:
+            sampler.stop()
+            self.write(environ, sampler, time.perf_counter() - started)
+
+    def write(self, environ, sampler, elapsed):
+        os.makedirs(self.output_dir, exist_ok=True)
+        route = re.sub(r'[^A-Za-z0-9]+', '_', environ.get('PATH_INFO', '')).strip('_') or 'root'
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{environ.get('REQUEST_METHOD')}-{route}-{os.getpid()}-{next(self._count)}"
+        base = os.path.join(self.output_dir, name)
+        with open(base + '.collapsed', 'w') as f:
+            f.write(sampler.collapsed())
+        with open(base + '.txt', 'w') as f:
+            f.write(f"{environ.get('REQUEST_METHOD')} {environ.get('PATH_INFO')} took {elapsed * 1000:.1f} ms\n")
+            f.write(sampler.summary())
+
+
+def init_app(app):
+    if app.config['PROFILING_ENABLED']:
+        app.wsgi_app = ProfilerMiddleware(app.wsgi_app, app.config)
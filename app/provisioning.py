@@ -0,0 +1,105 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from werkzeug.security import generate_password_hash
+from . import db
+from .models import User, upsert
+
+# Request/CSV field -> User column, as in create_user.
+FIELDS = {
+    'firstName': 'first_name',
+    'lastName': 'last_name',
+    'username': 'username',
+    'email': 'email',
+    'password': 'password',
+}
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def shared_pool(workers):
+    """A process pool kept for the life of the web worker, so bulk requests
+    do not start fresh interpreters each time."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def chunked(rows, size):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def hash_passwords(pool, passwords, workers):
+    # Hashing is deliberately slow and dominates the import; spread it over
+    # the pool in a few large pieces per worker to keep IPC overhead low.
+    return list(pool.map(generate_password_hash, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
+
+
+def import_users(rows, chunk_size=1000, workers=None, pool=None):
+    """Create users from dicts with the create_user fields. Usernames and
+    emails already taken, or repeated earlier in `rows`, are skipped; each
+    chunk is checked against the database in one query, hashed in a process
+    pool and inserted with one commit. Without `pool`, a pool of `workers`
+    processes (one per CPU by default) is started for this import.
+
+    Returns (created, skipped) where skipped lists (username, reason)."""
+    workers = workers or os.cpu_count()
+    if pool is None:
+        # spawn, not fork: the app may have threads (write-behind, snapshot
+        # rebuild) and open connections that a forked child must not inherit.
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            return import_users(rows, chunk_size, workers, pool)
+
+    created, skipped = 0, []
+    seen_usernames, seen_emails = set(), set()
+    for chunk in chunked(rows, chunk_size):
+        candidates = []
+        for row in chunk:
+            invalid = [field for field in FIELDS if not isinstance(row.get(field), str) or not row[field]]
+            if invalid:
+                skipped.append((row.get('username'), f"missing or not a string: {','.join(invalid)}"))
+            elif row['username'] in seen_usernames or row['email'] in seen_emails:
+                skipped.append((row['username'], 'duplicate in import'))
+            else:
+                seen_usernames.add(row['username'])
+                seen_emails.add(row['email'])
+                candidates.append({column: row[field] for field, column in FIELDS.items()})
+        if not candidates:
+            continue
+
+        taken = db.session.execute(
+            db.select(User.username, User.email).where(
+                User.username.in_([c['username'] for c in candidates]) |
+                User.email.in_([c['email'] for c in candidates])
+            )
+        ).all()
+        taken_usernames = {username for username, _ in taken}
+        taken_emails = {email for _, email in taken}
+        new = []
+        for candidate in candidates:
+            if candidate['username'] in taken_usernames or candidate['email'] in taken_emails:
+                skipped.append((candidate['username'], 'already exists'))
+            else:
+                new.append(candidate)
+        if not new:
+            continue
+
+        for candidate, hashed in zip(new, hash_passwords(pool, [c['password'] for c in new], workers)):
+            candidate['password'] = hashed
+        # ON CONFLICT DO NOTHING covers users who signed up while this
+        # chunk was being hashed.
+        inserted = set(db.session.execute(
+            upsert(User).on_conflict_do_nothing().returning(User.username), new
+        ).scalars())
+        db.session.commit()
+        created += len(inserted)
+        skipped.extend((c['username'], 'already exists') for c in new if c['username'] not in inserted)
+    return created, skipped
@@ -0,0 +1,138 @@
+import math
+import sqlite3
+import threading
+import time
+from functools import wraps
+from flask import current_app, make_response, request
+from .auth import token_auth
+
+
+def refill(tokens, updated, now, rate, burst):
+    return min(burst, tokens + (now - updated) * rate)
+
+
+class MemoryBackend:
+    """Token buckets in a dict; limits are per worker process."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, now):
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = refill(tokens, updated, now, rate, burst)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > 100000:
+                # Forget buckets idle long enough to have refilled completely.
+                self._buckets = {k: v for k, v in self._buckets.items() if now - v[1] < burst / rate}
+            return allowed, tokens
+
+
+class SQLiteBackend:
+    """Token buckets in a local SQLite file, so every gunicorn worker on the
+    host draws from the same buckets. Each take is one short IMMEDIATE
+    transaction."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._hits = 0
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = OFF')
+            conn.execute('CREATE TABLE IF NOT EXISTS bucket (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)')
+            self._local.conn = conn
+        return conn
+
+    def take(self, key, rate, burst, now):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated FROM bucket WHERE key = ?', (key,)).fetchone()
+            tokens = refill(row[0], row[1], now, rate, burst) if row else burst
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            conn.execute(
+                'INSERT INTO bucket (key, tokens, updated) VALUES (?, ?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated',
+                (key, tokens, now)
+            )
+            self._hits += 1
+            if self._hits % 10000 == 0:
+                conn.execute('DELETE FROM bucket WHERE updated < ?', (now - 3600,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return allowed, tokens
+
+
+class RateLimiter:
+    def __init__(self, backend, rules):
+        self.backend = backend
+        self.rules = rules
+
+    def hit(self, rule, key):
+        """Take a token for `key` under `rule`. Returns whether the request is
+        allowed and the rate-limit headers to send with the response."""
+        rate, burst = self.rules[rule]
+        try:
+            allowed, tokens = self.backend.take(f'{rule}:{key}', rate, burst, time.time())
+        except sqlite3.OperationalError as e:
+            # A busy or broken bucket store must not take the API down with it.
+            current_app.logger.warning('Rate limiter unavailable, allowing request: %s', e)
+            return True, {}
+        headers = {
+            'RateLimit-Limit': str(burst),
+            'RateLimit-Remaining': str(math.floor(tokens)),
+            'RateLimit-Reset': str(math.ceil((burst - tokens) / rate)),
+        }
+        if not allowed:
+            headers['Retry-After'] = str(math.ceil((1 - tokens) / rate))
+        return allowed, headers
+
+
+def client_key():
+    # Inside login_required the user is known; before it (e.g. /token, whose
+    # password check is the expensive part) only the address is. Behind a
+    # proxy that address comes from X-Forwarded-For (see TRUSTED_PROXIES).
+    user = token_auth.current_user()
+    if user is not None:
+        return f'user:{user.id}'
+    return f'ip:{request.remote_addr}'
+
+
+def rate_limit(rule):
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            limiter = current_app.extensions.get('ratelimit')
+            if limiter is None:
+                return f(*args, **kwargs)
+            allowed, headers = limiter.hit(rule, client_key())
+            if not allowed:
+                return {'error': 'Too many requests. Please try again later.'}, 429, headers
+            response = make_response(f(*args, **kwargs))
+            response.headers.update(headers)
+            return response
+        return wrapper
+    return decorator
+
+
+def init_app(app):
+    if not app.config['RATELIMIT_ENABLED']:
+        return
+    if app.config['RATELIMIT_BACKEND'] == 'sqlite':
+        backend = SQLiteBackend(app.config['RATELIMIT_SQLITE_PATH'])
+    else:
+        backend = MemoryBackend()
+    app.extensions['ratelimit'] = RateLimiter(backend, app.config['RATELIMIT_RULES'])
@@ -0,0 +1,58 @@
+import time
+from functools import wraps
+from flask import current_app, g, has_app_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql import Select
+
+REPLICA_BIND = 'replica'
+STICKY_COOKIE = 'read_primary_until'
+
+
+class RoutingSession(Session):
+    """Sends plain SELECTs to the `replica` bind while a view decorated with
+    `read_replica` is running. Flushes and writes always use the primary."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and not self._flushing
+            and isinstance(clause, Select)
+            and has_app_context()
+            and g.get('use_replica')
+        ):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_after_write():
+    try:
+        return float(request.cookies.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def read_replica(f):
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        g.use_replica = not read_after_write()
+        return f(*args, **kwargs)
+    return wrapper
+
+
+def stick_to_primary(response):
+    # After a successful write, keep this client's reads on the primary until
+    # the replica has had time to catch up.
+    if (
+        REPLICA_BIND in current_app.config.get('SQLALCHEMY_BINDS', {})
+        and request.method not in ('GET', 'HEAD', 'OPTIONS')
+        and response.status_code < 400
+    ):
+        window = current_app.config['READ_AFTER_WRITE_WINDOW']
+        response.set_cookie(STICKY_COOKIE, str(time.time() + window), max_age=int(window) + 1, httponly=True, samesite='Lax')
+    return response
+
+
+def init_app(app):
+    app.after_request(stick_to_primary)
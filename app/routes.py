@@ -1,10 +1,56 @@
-from flask import request
-from . import app, db 
-from .models import User, Recipe, Comment, Ingredient, Instruction, Save
+from flask import Blueprint, current_app, request, url_for
+from . import db
+from .models import User, Recipe, CuisineCount, Comment, Ingredient, Instruction, Save, DeadLetter, WriteReceipt, RecipeSimilarity, upsert
 from. auth import basic_auth, token_auth
+from .replica import read_replica, read_after_write
+from .singleflight import coalesce, single_flight
+from .ratelimit import rate_limit
+from datetime import datetime, timezone
+import json
+import math
 
+bp = Blueprint('api', __name__)
 
-@app.route('/users', methods = ['POST'])
+INGREDIENT_COLUMNS = (Ingredient.id, Ingredient.name, Ingredient.quantity, Ingredient.unit, Ingredient.recipe_id, Ingredient.user_id)
+INSTRUCTION_COLUMNS = (Instruction.id, Instruction.stepNumber, Instruction.body, Instruction.recipe_id, Instruction.user_id)
+
+
+def queue_write(model, op='insert', **values):
+    queue_id = current_app.extensions['write_behind'].put(model, values, op)
+    if queue_id is None:
+        return {'error': 'The server is busy. Please try again shortly.'}, 503, {'Retry-After': '1'}
+    return {'id': queue_id, 'status': 'queued'}, 202, {'Location': url_for('api.get_write', receipt=queue_id)}
+
+
+def owned_by(model, child_id, user_id):
+    # Ownership of ingredients and instructions comes from the parent recipe.
+    return (model.id == child_id) & model.recipe_id.in_(db.select(Recipe.id).where(Recipe.user_id == user_id))
+
+def update_owned(model, child_id, allowed_fields, columns=None):
+    """Apply the allowed fields from the request body to a row the current user
+    owns, in one UPDATE ... RETURNING. Returns `columns` (by default the id and
+    the changed fields), or None if the row is missing or not theirs."""
+    current_user = token_auth.current_user()
+    changes = {key: value for key, value in request.json.items() if key in allowed_fields}
+    if columns is None:
+        columns = [model.id] + [getattr(model, key) for key in changes]
+    where = owned_by(model, child_id, current_user.id)
+    if changes:
+        stmt = db.update(model).where(where).values(**changes).returning(*columns)
+    else:
+        stmt = db.select(*columns).where(where)
+    row = db.session.execute(stmt, execution_options={'synchronize_session': False}).one_or_none()
+    db.session.commit()
+    return row
+
+def owned_error(model, child_id, label, forbidden_message):
+    if db.session.execute(db.select(model.id).where(model.id == child_id)).first() is None:
+        return {"error": f"{label} with id of {child_id} does not exist"}, 404
+    return {'error': forbidden_message}, 403
+
+
+@bp.route('/users', methods = ['POST'])
+@rate_limit('writes')
 def create_user():
     if not request.is_json:
         return {"error": 'Your content-type must be application/json'}, 400
@@ -36,34 +82,138 @@ def create_user():
 
     return new_user.to_dict(), 201
 
-@app.route('/token')
+@bp.route('/admin/users/bulk', methods=['POST'])
+@token_auth.login_required
+@rate_limit('writes')
+def create_users_bulk():
+    if token_auth.current_user().username not in current_app.config['ADMIN_USERNAMES']:
+        return {'error': 'You do not have permission to create users in bulk'}, 403
+    if not request.is_json or not isinstance(request.json, dict):
+        return {"error": 'Your content-type must be application/json with an object body'}, 400
+    users = request.json.get('users')
+    if not isinstance(users, list) or not all(isinstance(user, dict) for user in users):
+        return {'error': 'users must be a list of user objects'}, 400
+    if len(users) > current_app.config['BULK_USERS_MAX']:
+        return {'error': f"At most {current_app.config['BULK_USERS_MAX']} users can be created per request"}, 413
+
+    from .provisioning import import_users, shared_pool
+    workers = current_app.config['BULK_USERS_WORKERS']
+    created, skipped = import_users(users, workers=workers, pool=shared_pool(workers))
+    return {
+        'created': created,
+        'skipped': [{'username': username, 'reason': reason} for username, reason in skipped]
+    }, 201
+
+@bp.route('/token')
+@rate_limit('token')
 @basic_auth.login_required
 def get_token():
     user=basic_auth.current_user()
     return user.get_token()
 
-@app.route('/users/me')
+@bp.route('/users/me')
 @token_auth.login_required
 def get_me():
     user = token_auth.current_user()
     return user.to_dict()
 
-@app.route('/recipes')
+@bp.route('/users/me/shopping-list')
+@token_auth.login_required
+def get_shopping_list():
+    # pandas is slow to import, so only workers that serve this route load it.
+    import pandas as pd
+    from .shopping import load_ingredients, saved_recipe_ids, build_shopping_list
+
+    current_user = token_auth.current_user()
+    try:
+        recipe_ids = [int(r) for r in request.args.get('recipes', '').split(',') if r.strip()]
+        servings = [float(n) for n in request.args.get('servings', '').split(',') if n.strip()]
+    except ValueError:
+        return {'error': 'recipes must be a comma-separated list of recipe ids and servings a list of numbers'}, 400
+    if not all(math.isfinite(n) and n > 0 for n in servings):
+        return {'error': 'servings must be positive numbers'}, 400
+    if len(servings) > 1 and not recipe_ids:
+        # Saved recipes come back in no particular order to match them against.
+        return {'error': 'pass recipes to give servings per recipe'}, 400
+
+    if recipe_ids:
+        ingredients = load_ingredients(set(recipe_ids))
+    else:
+        ingredients = load_ingredients(saved_recipe_ids(current_user.id))
+        recipe_ids = ingredients['recipe_id'].unique().tolist()
+
+    if len(servings) > 1 and len(servings) != len(recipe_ids):
+        return {'error': 'servings must be a single number or one number per recipe'}, 400
+    if len(servings) == 1:
+        servings = servings * len(recipe_ids)
+    plan = pd.DataFrame({'recipe_id': recipe_ids, 'servings': servings or float('nan')}, dtype='float64')
+    plan['recipe_id'] = plan['recipe_id'].astype('int64')
+
+    return build_shopping_list(ingredients, plan)
+
+@bp.route('/metrics/singleflight')
+def get_singleflight_metrics():
+    return single_flight.snapshot_stats()
+
+@bp.route('/recipes')
+@coalesce
+@read_replica
 def get_recipes():
+    cuisine = request.args.get('cuisine')
+    snapshot = current_app.extensions.get('snapshot')
+    if snapshot is not None and not read_after_write():
+        docs = snapshot.recipes(cuisine)
+        if docs is not None:
+            return current_app.response_class(f"[{','.join(docs)}]\n", mimetype='application/json')
+
     select_stmt = db.select(Recipe)
+    if cuisine:
+        select_stmt = select_stmt.where(Recipe.cuisine == cuisine)
     recipes = db.session.execute(select_stmt).scalars().all()
     return [r.to_dict() for r in recipes]
 
-@app.route('/recipes/<int:recipe_id>')
+@bp.route('/cuisines')
+@read_replica
+def get_cuisines():
+    cuisines = db.session.execute(
+        db.select(CuisineCount.cuisine, CuisineCount.recipe_count.label('count'))
+        .where(CuisineCount.recipe_count > 0)
+        .order_by(CuisineCount.recipe_count.desc(), CuisineCount.cuisine)
+    ).all()
+    return [row._asdict() for row in cuisines]
+
+@bp.route('/recipes/<int:recipe_id>')
+@coalesce
+@read_replica
 def get_recipe(recipe_id):
+    snapshot = current_app.extensions.get('snapshot')
+    if snapshot is not None and not read_after_write():
+        doc = snapshot.recipe(recipe_id)
+        if doc is not None:
+            return current_app.response_class(f"{doc}\n", mimetype='application/json')
     recipe = db.session.get(Recipe, recipe_id)
     if recipe:
         return recipe.to_dict()
     else:
         return {'error': f"Recipe with an ID of {recipe_id} does not exist"}, 404
 
-@app.route('/recipes', methods=['POST'])
+@bp.route('/recipes/<int:recipe_id>/similar')
+@read_replica
+def get_similar_recipes(recipe_id):
+    similar = db.session.execute(
+        db.select(Recipe.id, Recipe.name, Recipe.cuisine, RecipeSimilarity.score)
+        .join(RecipeSimilarity, RecipeSimilarity.similar_recipe_id == Recipe.id)
+        .where(RecipeSimilarity.recipe_id == recipe_id)
+        .order_by(RecipeSimilarity.rank)
+    ).all()
+    if similar:
+        return [row._asdict() for row in similar]
+    else:
+        return {'error': f"Similar recipes for this recipe do not exist"}, 404
+
+@bp.route('/recipes', methods=['POST'])
 @token_auth.login_required
+@rate_limit('writes')
 def create_recipe():
     if not request.is_json:
         return {'error': 'Your content-type must be applicaion/json'}
@@ -89,8 +239,9 @@ def create_recipe():
 
     return new_recipe.to_dict(), 201
 
-@app.route('/recipes/<int:recipe_id>', methods=['PUT'])
+@bp.route('/recipes/<int:recipe_id>', methods=['PUT'])
 @token_auth.login_required
+@rate_limit('writes')
 def edit_recipe(recipe_id):
     if not request.is_json:
         return {"error": "Your content-type must be application/json"}, 400
@@ -106,8 +257,9 @@ def edit_recipe(recipe_id):
     recipe.update(**data)
     return recipe.to_dict()
 
-@app.route('/recipes/<int:recipe_id>', methods=["DELETE"])
+@bp.route('/recipes/<int:recipe_id>', methods=["DELETE"])
 @token_auth.login_required
+@rate_limit('writes')
 def delete_recipe(recipe_id):
     recipe = db.session.get(Recipe, recipe_id)
 
@@ -131,8 +283,9 @@ def delete_recipe(recipe_id):
     recipe.delete()
     return {'success': f"'{recipe.name}' was successfully deleted"}, 200
 
-@app.route('/recipes/<int:recipe_id>/comments', methods=['POST'])
+@bp.route('/recipes/<int:recipe_id>/comments', methods=['POST'])
 @token_auth.login_required
+@rate_limit('writes')
 def create_comment(recipe_id):
     if not request.is_json:
         return {"error": 'Your content type must be application/json'}, 400
@@ -152,12 +305,17 @@ def create_comment(recipe_id):
         return {"error": f"{', '.join(missing_fields)} must be present in the request body"}, 400
     
     body = data.get('body')
+    if not isinstance(body, str):
+        return {'error': 'body must be a string'}, 400
     current_user = token_auth.current_user()
+    if current_app.config['WRITE_BEHIND']:
+        return queue_write(Comment, body=body, user_id=current_user.id, recipe_id=recipe.id, date_created=datetime.now(timezone.utc))
     new_comment = Comment(body=body, user_id = current_user.id, recipe_id =recipe.id)
     return new_comment.to_dict(), 201
 
-@app.route('/recipes/<int:recipe_id>/comments/<int:comment_id>', methods = {'DELETE'})
+@bp.route('/recipes/<int:recipe_id>/comments/<int:comment_id>', methods = {'DELETE'})
 @token_auth.login_required
+@rate_limit('writes')
 def delete_comment(recipe_id, comment_id):
     recipe=db.session.get(Recipe, recipe_id)
     if recipe is None:
@@ -177,19 +335,21 @@ def delete_comment(recipe_id, comment_id):
     comment.delete()
     return {"success": f"Comment {comment_id} was successfully deleted."}
 
-@app.route('/recipes/<int:recipe_id>/ingredients/')
+@bp.route('/recipes/<int:recipe_id>/ingredients/')
+@read_replica
 def get_ingredients(recipe_id):
-    ingredients = db.session.execute(db.select(Ingredient).filter_by(recipe_id=recipe_id)).scalars().all()
+    ingredients = db.session.execute(
+        db.select(*INGREDIENT_COLUMNS)
+        .where(Ingredient.recipe_id == recipe_id)
+    ).all()
     if ingredients:
-        ingredients_output = []
-        for ingredient in ingredients:
-            ingredients_output.append(ingredient.to_dict())
-        return ingredients_output
+        return [row._asdict() for row in ingredients]
     else:
         return {'error': f"Ingredients for this recipe do not exist"}, 404
 
-@app.route('/recipes/<int:recipe_id>/ingredients', methods=['POST'])
+@bp.route('/recipes/<int:recipe_id>/ingredients', methods=['POST'])
 @token_auth.login_required
+@rate_limit('writes')
 def create_ingredient(recipe_id):
     if not request.is_json:
         return {'error': 'Your content-type must be applicaion/json'}
@@ -219,51 +379,56 @@ def create_ingredient(recipe_id):
 
 
 
-@app.route('/recipes/ingredients/<int:ingredient_id>', methods=['PUT'])
+@bp.route('/recipes/ingredients/<int:ingredient_id>', methods=['PUT'])
 @token_auth.login_required
+@rate_limit('writes')
 def edit_ingredient(ingredient_id):
     if not request.is_json:
         return {"error": "Your content-type must be application/json"}, 400
-    ingredient = db.session.get(Ingredient, ingredient_id)
-    if ingredient is None:
-        return {"error": f"Ingredient with id of {ingredient_id} does not exist"}, 404
-    current_user=token_auth.current_user()
-    if current_user is not ingredient.recipe.author:
-        return {'error': "This is not your recipe. You do not ahve permission to edit"}, 403
-    
-    data=request.json
+    row = update_owned(Ingredient, ingredient_id, ['name', 'quantity', 'unit'], INGREDIENT_COLUMNS)
+    if row is None:
+        return owned_error(Ingredient, ingredient_id, "Ingredient", "This is not your recipe. You do not ahve permission to edit")
+    return row._asdict()
 
-    ingredient.update(**data)
-    return ingredient.to_dict()
+@bp.route('/recipes/ingredients/<int:ingredient_id>', methods=['PATCH'])
+@token_auth.login_required
+@rate_limit('writes')
+def patch_ingredient(ingredient_id):
+    if not request.is_json:
+        return {"error": "Your content-type must be application/json"}, 400
+    row = update_owned(Ingredient, ingredient_id, ['name', 'quantity', 'unit'])
+    if row is None:
+        return owned_error(Ingredient, ingredient_id, "Ingredient", "This is not your recipe. You do not ahve permission to edit")
+    return row._asdict()
 
-@app.route('/recipes/ingredients/<int:ingredient_id>', methods=["DELETE"])
+@bp.route('/recipes/ingredients/<int:ingredient_id>', methods=["DELETE"])
 @token_auth.login_required
+@rate_limit('writes')
 def delete_ingredient(ingredient_id):
-    ingredient = db.session.get(Ingredient, ingredient_id)
-
-    if ingredient is None:
-        return {"error": f"Ingredient with id of {ingredient_id} does not exist"}, 404
-    
     current_user=token_auth.current_user()
-    if ingredient.recipe.author is not current_user:
-        return {'error':'You do not have permission to delete this ingredient'}, 403
-    
-    ingredient.delete()
-    return {'success': f"'{ingredient.name}' was successfully deleted"}, 200
-
-@app.route('/recipes/<int:recipe_id>/instructions')
+    stmt = db.delete(Ingredient).where(owned_by(Ingredient, ingredient_id, current_user.id)).returning(Ingredient.name)
+    name = db.session.execute(stmt, execution_options={'synchronize_session': False}).scalar_one_or_none()
+    db.session.commit()
+    if name is None:
+        return owned_error(Ingredient, ingredient_id, "Ingredient", "You do not have permission to delete this ingredient")
+    return {'success': f"'{name}' was successfully deleted"}, 200
+
+@bp.route('/recipes/<int:recipe_id>/instructions')
+@read_replica
 def get_instruction(recipe_id):
-    instructions = db.session.execute(db.select(Instruction).filter_by(recipe_id=recipe_id)).scalars().all()
+    instructions = db.session.execute(
+        db.select(*INSTRUCTION_COLUMNS)
+        .where(Instruction.recipe_id == recipe_id)
+        .order_by(Instruction.stepNumber, Instruction.id)
+    ).all()
     if instructions:
-        instructions_output = []
-        for instruction in instructions:
-            instructions_output.append(instruction.to_dict())
-        return instructions_output
+        return [row._asdict() for row in instructions]
     else:
         return {'error': f"Instructions for this recipe do not exist"}, 404
 
-@app.route('/recipes/<int:recipe_id>/instructions', methods=['POST'])
+@bp.route('/recipes/<int:recipe_id>/instructions', methods=['POST'])
 @token_auth.login_required
+@rate_limit('writes')
 def create_instruction(recipe_id):
     if not request.is_json:
         return {'error': 'Your content-type must be applicaion/json'}
@@ -291,85 +456,156 @@ def create_instruction(recipe_id):
     return new_instruction.to_dict(), 201
 
 
-@app.route('/recipes/instructions/<int:instruction_id>', methods=['PUT'])
+@bp.route('/recipes/<int:recipe_id>/instructions/order', methods=['PUT'])
 @token_auth.login_required
+@rate_limit('writes')
+def reorder_instructions(recipe_id):
+    if not request.is_json or not isinstance(request.json, dict):
+        return {"error": 'Your content-type must be application/json with an object body'}, 400
+    recipe = db.session.get(Recipe, recipe_id)
+    if recipe is None:
+        return {'error': f"Recipe {recipe_id} does not exist."}, 404
+    current_user=token_auth.current_user()
+    if recipe.user_id != current_user.id:
+        return {'error': "This is not your recipe. You do not have permission to edit"}, 403
+
+    instruction_ids = request.json.get('instructionIds')
+    if not isinstance(instruction_ids, list) or not all(type(i) is int for i in instruction_ids):
+        return {'error': 'instructionIds must be a list of instruction ids'}, 400
+    current_ids = set(db.session.execute(db.select(Instruction.id).where(Instruction.recipe_id == recipe_id)).scalars())
+    if len(instruction_ids) != len(current_ids) or set(instruction_ids) != current_ids:
+        return {'error': f"instructionIds must list every instruction of recipe {recipe_id} exactly once"}, 400
+
+    # Renumber every step with one UPDATE ... SET stepNumber = CASE id ... END.
+    # A step added since the check above keeps its number.
+    if instruction_ids:
+        step_numbers = {instruction_id: step for step, instruction_id in enumerate(instruction_ids, start=1)}
+        db.session.execute(
+            db.update(Instruction)
+            .where(Instruction.recipe_id == recipe_id)
+            .values(stepNumber=db.case(step_numbers, value=Instruction.id, else_=Instruction.stepNumber)),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.commit()
+
+    instructions = db.session.execute(
+        db.select(*INSTRUCTION_COLUMNS)
+        .where(Instruction.recipe_id == recipe_id)
+        .order_by(Instruction.stepNumber)
+    ).all()
+    return [row._asdict() for row in instructions]
+
+@bp.route('/recipes/instructions/<int:instruction_id>', methods=['PUT'])
+@token_auth.login_required
+@rate_limit('writes')
 def edit_instruction(instruction_id):
     if not request.is_json:
         return {"error": "Your content-type must be application/json"}, 400
-    instruction = db.session.get(Instruction, instruction_id)
-    if instruction is None:
-        return {"error": f"Instruction with id of {instruction_id} does not exist"}, 404
-    current_user=token_auth.current_user()
-    if current_user is not instruction.recipe.author:
-        return {'error': "This is not your recipe. You do not have permission to edit"}, 403
-    
-    data=request.json
+    row = update_owned(Instruction, instruction_id, ['stepNumber', 'body'], INSTRUCTION_COLUMNS)
+    if row is None:
+        return owned_error(Instruction, instruction_id, "Instruction", "This is not your recipe. You do not have permission to edit")
+    return row._asdict()
 
-    instruction.update(**data)
-    return instruction.to_dict()
+@bp.route('/recipes/instructions/<int:instruction_id>', methods=['PATCH'])
+@token_auth.login_required
+@rate_limit('writes')
+def patch_instruction(instruction_id):
+    if not request.is_json:
+        return {"error": "Your content-type must be application/json"}, 400
+    row = update_owned(Instruction, instruction_id, ['stepNumber', 'body'])
+    if row is None:
+        return owned_error(Instruction, instruction_id, "Instruction", "This is not your recipe. You do not have permission to edit")
+    return row._asdict()
 
-@app.route('/recipes/instructions/<int:instruction_id>', methods=["DELETE"])
+@bp.route('/recipes/instructions/<int:instruction_id>', methods=["DELETE"])
 @token_auth.login_required
+@rate_limit('writes')
 def delete_instruction(instruction_id):
-    instruction = db.session.get(Instruction, instruction_id)
-    if instruction is None:
-        return {"error": f"Instruction with id of {instruction_id} does not exist"}, 404
-    
     current_user=token_auth.current_user()
-    if instruction.recipe.author is not current_user:
-        return {'error':'You do not have permission to delete this instruction'}, 403
-    
-    instruction.delete()
-    return {'success': f"Step '{instruction.stepNumber}' was successfully deleted"}, 200
-
-@app.route('/recipes/<int:recipe_id>/saves')
+    stmt = db.delete(Instruction).where(owned_by(Instruction, instruction_id, current_user.id)).returning(Instruction.stepNumber)
+    step_number = db.session.execute(stmt, execution_options={'synchronize_session': False}).scalar_one_or_none()
+    db.session.commit()
+    if step_number is None:
+        return owned_error(Instruction, instruction_id, "Instruction", "You do not have permission to delete this instruction")
+    return {'success': f"Step '{step_number}' was successfully deleted"}, 200
+
+@bp.route('/recipes/<int:recipe_id>/saves')
+@read_replica
 def get_saves(recipe_id):
-    saves = db.session.execute(db.select(Save).filter_by(recipe_id=recipe_id)).scalars().all()
+    saves = db.session.execute(
+        db.select(Save.id, Save.recipe_id, Save.user_id).where(Save.recipe_id == recipe_id)
+    ).all()
     if saves:
-        saves_output = []
-        for s in saves:
-            saves_output.append(s.to_dict())
-        return saves_output
+        return [row._asdict() for row in saves]
     else:
         return {'error': f"This recipe has not been saved."}, 404
 
-@app.route('/recipes/<int:recipe_id>/save', methods=['POST'])
+@bp.route('/recipes/<int:recipe_id>/save', methods=['POST'])
 @token_auth.login_required
+@rate_limit('writes')
 def create_save(recipe_id):
-    recipe=db.session.get(Recipe, recipe_id)
-    if recipe is None:
-        return {'error': f"Recipe {recipe_id} does not exist."}, 404
-    
     current_user=token_auth.current_user()
+    if current_app.config['WRITE_BEHIND']:
+        if db.session.get(Recipe, recipe_id) is None:
+            return {'error': f"Recipe {recipe_id} does not exist."}, 404
+        return queue_write(Save, user_id=current_user.id, recipe_id=recipe_id)
+
+    # The recipe lookup rides along in the INSERT ... SELECT, and the unique
+    # (user_id, recipe_id) constraint turns a repeated save into a no-op.
+    stmt = (
+        upsert(Save)
+        .from_select(['user_id', 'recipe_id'], db.select(db.literal(current_user.id), Recipe.id).where(Recipe.id == recipe_id))
+        .on_conflict_do_nothing(index_elements=['user_id', 'recipe_id'])
+        .returning(Save.id)
+    )
+    save_id = db.session.execute(stmt).scalar_one_or_none()
+    db.session.commit()
+    if save_id is not None:
+        return {"id": save_id, "recipe_id": recipe_id, "user_id": current_user.id}, 201
+
+    save_id = db.session.execute(
+        db.select(Save.id).where((Save.user_id == current_user.id) & (Save.recipe_id == recipe_id))
+    ).scalar_one_or_none()
+    if save_id is None:
+        return {'error': f"Recipe {recipe_id} does not exist."}, 404
+    return {"id": save_id, "recipe_id": recipe_id, "user_id": current_user.id}, 200
 
-    check_save = db.session.execute(db.select(Save).where((Save.user_id == current_user.id) & (Save.recipe_id == recipe_id)))
-
-    check = 0
-    for save in check_save:
-        check+=1
-
-    if check>0:
-        return {"error": "This recipe has already been saved."}, 406
-    
-    new_save = Save(recipe_id =recipe_id, user_id=current_user.id)
-
-    return new_save.to_dict(), 201
-
-@app.route('/recipes/<int:recipe_id>/save', methods=['DELETE'])
+@bp.route('/recipes/<int:recipe_id>/save', methods=['DELETE'])
 @token_auth.login_required
+@rate_limit('writes')
 def delete_save(recipe_id):
-    recipe=db.session.get(Recipe, recipe_id)
-    if recipe is None:
-        return {'error': f"Recipe {recipe_id} does not exist."}, 404
-    
     current_user=token_auth.current_user()
-    check_save = db.session.execute(db.select(Save).where((Save.user_id == current_user.id) and (Save.recipe_id == recipe_id)))
+    if current_app.config['WRITE_BEHIND']:
+        # Queued behind any save still waiting, so save-then-unsave ends unsaved.
+        if db.session.get(Recipe, recipe_id) is None:
+            return {'error': f"Recipe {recipe_id} does not exist."}, 404
+        return queue_write(Save, op='delete', user_id=current_user.id, recipe_id=recipe_id)
+
+    stmt = (
+        db.delete(Save)
+        .where((Save.user_id == current_user.id) & (Save.recipe_id == recipe_id))
+        .returning(Save.id)
+    )
+    save_id = db.session.execute(stmt).scalar_one_or_none()
+    db.session.commit()
+    if save_id is None and db.session.get(Recipe, recipe_id) is None:
+        return {'error': f"Recipe {recipe_id} does not exist."}, 404
 
-    if check_save is None:
-        return {'error': 'Save for this recipe does not exist'}
-    if check_save.author is not current_user:
-        return {'error':'You do not have permission to delete this save'}, 403
-    
-    check_save[0].delete()
+    return {'success': f"Save for recipe {recipe_id} was successfully deleted"}, 200
 
-    return {'success': f"Save for recipe {recipe_id} was successfully deleted"}, 200
\ No newline at end of file
+@bp.route('/writes/<receipt>')
+@token_auth.login_required
+def get_write(receipt):
+    """Look up a write queued by the write-behind path by the id its 202
+    response returned."""
+    current_user = token_auth.current_user()
+    stored = db.session.execute(
+        db.select(WriteReceipt).where((WriteReceipt.receipt == receipt) & (WriteReceipt.user_id == current_user.id))
+    ).scalar_one_or_none()
+    if stored is not None:
+        return {'id': receipt, 'status': stored.status, 'type': stored.model, stored.model + '_id': stored.row_id, 'recipe_id': stored.recipe_id}
+
+    failed = db.session.execute(db.select(DeadLetter).where(DeadLetter.receipt == receipt)).scalar_one_or_none()
+    if failed is not None and json.loads(failed.payload).get('user_id') == current_user.id:
+        return {'id': receipt, 'status': 'failed', 'type': failed.model, 'error': failed.error}
+    return {'error': f"No write with id {receipt} has been stored yet; it may still be queued."}, 404
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+from . import db
+from .models import Ingredient, Recipe, Save
+
+# Unit spelling -> (canonical unit, multiplier into the canonical unit).
+# Units not listed here are kept as written and only summed with themselves.
+UNIT_CONVERSIONS = {
+    'ml': ('ml', 1.0), 'milliliter': ('ml', 1.0), 'millilitre': ('ml', 1.0),
+    'l': ('ml', 1000.0), 'liter': ('ml', 1000.0), 'litre': ('ml', 1000.0),
+    'tsp': ('ml', 4.92892), 'teaspoon': ('ml', 4.92892),
+    'tbsp': ('ml', 14.7868), 'tablespoon': ('ml', 14.7868),
+    'fl oz': ('ml', 29.5735), 'fluid ounce': ('ml', 29.5735),
+    'cup': ('ml', 236.588), 'c': ('ml', 236.588),
+    'pint': ('ml', 473.176), 'pt': ('ml', 473.176),
+    'quart': ('ml', 946.353), 'qt': ('ml', 946.353),
+    'gallon': ('ml', 3785.41), 'gal': ('ml', 3785.41),
+    'g': ('g', 1.0), 'gram': ('g', 1.0), 'gramme': ('g', 1.0),
+    'kg': ('g', 1000.0), 'kilogram': ('g', 1000.0),
+    'oz': ('g', 28.3495), 'ounce': ('g', 28.3495),
+    'lb': ('g', 453.592), 'pound': ('g', 453.592),
+}
+CANONICAL_UNIT = {unit: canonical for unit, (canonical, _) in UNIT_CONVERSIONS.items()}
+UNIT_FACTOR = {unit: factor for unit, (_, factor) in UNIT_CONVERSIONS.items()}
+
+
+def load_ingredients(recipe_ids):
+    """All ingredient rows for `recipe_ids` (an id list or a select of ids),
+    joined with the recipe's servings, in one query."""
+    rows = db.session.execute(
+        db.select(Ingredient.recipe_id, Ingredient.name, Ingredient.quantity, Ingredient.unit, Recipe.servings)
+        .join(Recipe, Ingredient.recipe_id == Recipe.id)
+        .where(Ingredient.recipe_id.in_(recipe_ids))
+    ).all()
+    return pd.DataFrame(rows, columns=['recipe_id', 'name', 'quantity', 'unit', 'servings'])
+
+
+def saved_recipe_ids(user_id):
+    return db.select(Save.recipe_id).where(Save.user_id == user_id)
+
+
+def build_shopping_list(ingredients, plan):
+    """Scale and sum `ingredients` for a meal plan.
+
+    `plan` has one row per planned recipe with columns `recipe_id` and
+    `servings` (NaN keeps the recipe's own yield). A recipe listed twice is
+    counted twice.
+    """
+    if ingredients.empty or plan.empty:
+        return []
+    df = plan.rename(columns={'servings': 'target'}).merge(ingredients, on='recipe_id')
+    if df.empty:
+        return []
+
+    # Recipe.servings is free text ("4", "4-6", "serves 8"); use its first number.
+    base = pd.to_numeric(df['servings'].astype('string').str.extract(r'(\d+(?:\.\d+)?)', expand=False), errors='coerce')
+    scale = (df['target'] / base).replace([np.inf, -np.inf], np.nan).fillna(1.0)
+
+    unit = df['unit'].astype('string').str.lower().str.strip().str.rstrip('.').str.replace(r'\s+', ' ', regex=True)
+    singular = unit.str.replace(r'(?<=\w)s$', '', regex=True)
+    unit = unit.where(unit.isin(CANONICAL_UNIT.keys()), singular.where(singular.isin(CANONICAL_UNIT.keys()), unit))
+
+    df = pd.DataFrame({
+        'name': df['name'].astype('string').str.lower().str.strip().str.replace(r'\s+', ' ', regex=True),
+        'unit': unit.map(CANONICAL_UNIT).fillna(unit),
+        'quantity': df['quantity'].astype('float64') * unit.map(UNIT_FACTOR).fillna(1.0).astype('float64') * scale,
+    })
+    totals = df.groupby(['name', 'unit'], sort=True, dropna=False)['quantity'].sum().round(2).reset_index()
+    return totals.to_dict('records')
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from . import db
+from .models import Recipe, Ingredient, Save, RecipeSimilarity
+
+
+def normalize_rows(matrix):
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags((1.0 / norms).astype(np.float32)) @ matrix
+
+
+def incidence_matrix(recipe_ids, pairs, column):
+    """Sparse recipes x `column` 0/1 matrix built from (recipe_id, column) rows."""
+    pairs = pairs.drop_duplicates()
+    pairs = pairs[pairs['recipe_id'].isin(recipe_ids)]
+    rows = np.searchsorted(recipe_ids, pairs['recipe_id'].to_numpy())
+    cols, uniques = pd.factorize(pairs[column])
+    data = np.ones(len(rows), dtype=np.float32)
+    return sparse.csr_matrix((data, (rows, cols)), shape=(len(recipe_ids), len(uniques)))
+
+
+def recipe_vectors(ingredient_weight):
+    """One row per recipe: IDF-weighted ingredient set next to the set of users
+    who saved it, each part unit length and weighted so a dot product of two
+    rows is a blend of the two cosine similarities."""
+    recipe_ids = np.array(db.session.execute(db.select(Recipe.id).order_by(Recipe.id)).scalars().all(), dtype=np.int64)
+
+    ingredients = pd.DataFrame(
+        db.session.execute(db.select(Ingredient.recipe_id, Ingredient.name)).all(),
+        columns=['recipe_id', 'name']
+    )
+    ingredients['name'] = ingredients['name'].str.lower().str.strip()
+    by_ingredient = incidence_matrix(recipe_ids, ingredients, 'name')
+    document_frequency = np.asarray(by_ingredient.sum(axis=0)).ravel()
+    # Unsmoothed IDF: an ingredient in every recipe (salt, water) weighs zero
+    # and drops out of the matrix, which keeps the similarity products sparse.
+    idf = np.log((1 + len(recipe_ids)) / (1 + document_frequency)).astype(np.float32)
+    by_ingredient = normalize_rows(by_ingredient @ sparse.diags(idf))
+    by_ingredient.eliminate_zeros()
+
+    saves = pd.DataFrame(
+        db.session.execute(db.select(Save.recipe_id, Save.user_id)).all(),
+        columns=['recipe_id', 'user_id']
+    )
+    by_saver = normalize_rows(incidence_matrix(recipe_ids, saves, 'user_id'))
+
+    vectors = sparse.hstack([
+        by_ingredient * np.float32(np.sqrt(ingredient_weight)),
+        by_saver * np.float32(np.sqrt(1 - ingredient_weight)),
+    ]).tocsr()
+    return recipe_ids, vectors
+
+
+def build_similarities(only=None, top_k=20, chunk_size=1024, ingredient_weight=0.7):
+    """Recompute the stored top-K neighbours for every recipe, or only for the
+    recipe ids in `only`. Rows are scored a chunk at a time and each chunk
+    commits separately. Returns the number of recipes processed."""
+    recipe_ids, vectors = recipe_vectors(ingredient_weight)
+    targets = np.arange(len(recipe_ids))
+    if only is not None:
+        targets = targets[np.isin(recipe_ids, list(only))]
+    transposed = vectors.T.tocsr()
+
+    for start in range(0, len(targets), chunk_size):
+        rows = targets[start:start + chunk_size]
+        chunk_ids = recipe_ids[rows]
+        scores = (vectors[rows] @ transposed).tocsr()
+
+        # Flatten the sparse scores, drop self-matches, sort by (row, score
+        # desc) and keep the first top_k entries of every row. Scores are in
+        # (0, 1], so 2 * row + (1 - score) orders both at once and one argsort
+        # is several times faster than lexsort.
+        row = np.repeat(np.arange(len(rows)), np.diff(scores.indptr))
+        col, score = scores.indices, scores.data
+        keep = (col != rows[row]) & (score > 0)
+        row, col, score = row[keep], col[keep], score[keep]
+        order = np.argsort(row * 2.0 + (1.0 - score))
+        row, col, score = row[order], col[order], score[order]
+        rank = np.arange(len(row)) - np.searchsorted(row, row)
+        keep = rank < top_k
+
+        db.session.execute(db.delete(RecipeSimilarity).where(RecipeSimilarity.recipe_id.in_(chunk_ids.tolist())))
+        if keep.any():
+            db.session.execute(RecipeSimilarity.__table__.insert(), [
+                {'recipe_id': recipe_id, 'rank': rank + 1, 'similar_recipe_id': similar_id, 'score': score}
+                for recipe_id, rank, similar_id, score in zip(
+                    chunk_ids[row[keep]].tolist(),
+                    rank[keep].tolist(),
+                    recipe_ids[col[keep]].tolist(),
+                    score[keep].astype(float).round(6).tolist(),
+                )
+            ])
+        db.session.commit()
+    return len(targets)
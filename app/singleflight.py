@@ -0,0 +1,83 @@
+import threading
+from functools import wraps
+from flask import current_app, make_response, request
+from .replica import read_after_write
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs at most one computation per key at a time. Callers that arrive while
+    one is in flight wait for it and share its result instead of repeating the
+    work. A caller that waits longer than `timeout` computes on its own."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.stats = {'loads': 0, 'collapsed': 0, 'timeouts': 0}
+
+    def do(self, key, fn, timeout=None):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.stats['loads'] += 1
+
+        if not leader:
+            if call.done.wait(timeout):
+                with self._lock:
+                    self.stats['collapsed'] += 1
+                if call.error is not None:
+                    raise call.error
+                return call.result
+            with self._lock:
+                self.stats['timeouts'] += 1
+                self.stats['loads'] += 1
+            return fn()
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def snapshot_stats(self):
+        with self._lock:
+            return dict(self.stats, in_flight=len(self._calls))
+
+
+single_flight = SingleFlight()
+
+
+def coalesce(f):
+    """Share one execution of a read-only view between concurrent requests for
+    the same endpoint, URL arguments and query string."""
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        key = (
+            request.endpoint,
+            tuple(sorted(request.view_args.items())),
+            tuple(sorted(request.args.items(multi=True))),
+            read_after_write(),
+        )
+
+        def render():
+            # Share the rendered body, not the Response object, so every
+            # request gets its own response to add headers and cookies to.
+            response = make_response(f(*args, **kwargs))
+            return response.get_data(), response.status_code, list(response.headers.items())
+
+        body, status, headers = single_flight.do(key, render, current_app.config['SINGLEFLIGHT_TIMEOUT'])
+        return current_app.response_class(body, status=status, headers=headers)
+    return wrapper
@@ -0,0 +1,148 @@
+import fcntl
+import os
+import sqlite3
+import threading
+import time
+from flask import current_app
+from sqlalchemy.orm import selectinload
+from . import db
+from .models import Recipe, Comment, Save
+
+SCHEMA = """
+CREATE TABLE recipe (id INTEGER PRIMARY KEY, cuisine TEXT NOT NULL, doc TEXT NOT NULL);
+CREATE INDEX ix_recipe_cuisine ON recipe (cuisine);
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+
+def build_snapshot(path):
+    """Write every recipe, serialized exactly as get_recipe returns it, to a new
+    SQLite file and atomically move it over `path`. Returns the recipe count."""
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    built_at = time.time()
+    save_counts = dict(db.session.execute(
+        db.select(Save.recipe_id, db.func.count(Save.id)).group_by(Save.recipe_id)
+    ).all())
+    recipes = db.session.execute(
+        db.select(Recipe)
+        .options(selectinload(Recipe.author), selectinload(Recipe.comments).selectinload(Comment.author))
+        .order_by(Recipe.id)
+        .execution_options(yield_per=1000)
+    ).scalars()
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute('PRAGMA journal_mode = OFF')
+        conn.execute('PRAGMA synchronous = OFF')
+        conn.executescript(SCHEMA)
+        count = 0
+        for partition in recipes.partitions():
+            conn.executemany('INSERT INTO recipe (id, cuisine, doc) VALUES (?, ?, ?)', [
+                (recipe.id, recipe.cuisine, current_app.json.dumps(recipe.to_dict(saves=save_counts.get(recipe.id, 0)), separators=(',', ':')))
+                for recipe in partition
+            ])
+            count += len(partition)
+        conn.execute("INSERT INTO meta (key, value) VALUES ('built_at', ?)", (str(built_at),))
+        conn.commit()
+    finally:
+        conn.close()
+        db.session.rollback()
+    os.replace(tmp_path, path)
+    return count
+
+
+class SnapshotReader:
+    """Serves recipe JSON from the snapshot at `path`, opened read-only and
+    immutable with mmap. Each thread keeps its own connection and reopens it
+    when the file has been swapped. Methods return None when there is no
+    snapshot or it is older than `max_staleness` seconds, so callers fall back
+    to the live database."""
+
+    def __init__(self, app, path, max_staleness, rebuild_interval, mmap_size):
+        self.app = app
+        self.path = path
+        self.max_staleness = max_staleness
+        self.rebuild_interval = rebuild_interval
+        self.mmap_size = mmap_size
+        self._local = threading.local()
+        self._builder = None
+        self._builder_lock = threading.Lock()
+
+    def _connection(self):
+        self._start_builder()
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        local = self._local
+        version = (stat.st_ino, stat.st_mtime_ns)
+        if getattr(local, 'version', None) != version:
+            if getattr(local, 'conn', None) is not None:
+                local.conn.close()
+            local.conn = sqlite3.connect(f'file:{self.path}?mode=ro&immutable=1', uri=True, check_same_thread=False)
+            local.conn.execute(f'PRAGMA mmap_size = {int(self.mmap_size)}')
+            local.built_at = float(local.conn.execute("SELECT value FROM meta WHERE key = 'built_at'").fetchone()[0])
+            local.version = version
+        if time.time() - local.built_at > self.max_staleness:
+            return None
+        return local.conn
+
+    def recipe(self, recipe_id):
+        conn = self._connection()
+        if conn is None:
+            return None
+        row = conn.execute('SELECT doc FROM recipe WHERE id = ?', (recipe_id,)).fetchone()
+        return row[0] if row else None
+
+    def recipes(self, cuisine=None):
+        conn = self._connection()
+        if conn is None:
+            return None
+        if cuisine:
+            rows = conn.execute('SELECT doc FROM recipe WHERE cuisine = ? ORDER BY id', (cuisine,))
+        else:
+            rows = conn.execute('SELECT doc FROM recipe ORDER BY id')
+        return [row[0] for row in rows]
+
+    def _start_builder(self):
+        if not self.rebuild_interval or (self._builder is not None and self._builder.is_alive()):
+            return
+        with self._builder_lock:
+            if self._builder is None or not self._builder.is_alive():
+                self._builder = threading.Thread(target=self._rebuild_forever, name='snapshot-builder', daemon=True)
+                self._builder.start()
+
+    def _rebuild_forever(self):
+        # Every worker runs this loop; the lock file and the age check make
+        # sure only one of them rebuilds per interval.
+        while True:
+            with open(f'{self.path}.lock', 'w') as lock:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    pass
+                else:
+                    try:
+                        age = time.time() - os.stat(self.path).st_mtime
+                    except FileNotFoundError:
+                        age = float('inf')
+                    if age >= self.rebuild_interval:
+                        with self.app.app_context():
+                            try:
+                                build_snapshot(self.path)
+                            except Exception:
+                                self.app.logger.exception('Rebuilding the catalog snapshot failed')
+            time.sleep(self.rebuild_interval)
+
+
+def init_app(app):
+    if app.config['SNAPSHOT_PATH']:
+        app.extensions['snapshot'] = SnapshotReader(
+            app,
+            app.config['SNAPSHOT_PATH'],
+            max_staleness=app.config['SNAPSHOT_MAX_STALENESS'],
+            rebuild_interval=app.config['SNAPSHOT_REBUILD_INTERVAL'],
+            mmap_size=app.config['SNAPSHOT_MMAP_SIZE'],
+        )
@@ -0,0 +1,177 @@
+import atexit
+import json
+import queue
+import threading
+import time
+import uuid
+from . import db
+from .models import Comment, DeadLetter, Save, WriteReceipt, upsert
+
+
+class WriteBehindQueue:
+    """Buffers comment inserts and save/unsave operations and writes them in
+    batched transactions from a background thread, so a burst of requests
+    becomes a few commits. Operations on the same save go through the queue
+    in order, so an unsave right after a save wins.
+
+    Every queued operation gets a receipt, and its outcome is recorded in
+    write_receipt in the same transaction as the write. A batch that fails is
+    retried in halves down to single operations, and one that still fails is
+    kept in the dead_letter table under its receipt."""
+
+    def __init__(self, app, maxsize, flush_interval, batch_size, put_timeout):
+        self.app = app
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize)
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def put(self, model, values, op='insert'):
+        """Enqueue an insert (or, for saves, a delete) of `values` for `model`.
+        Returns a receipt id, or None when the queue stays full for longer
+        than `put_timeout`."""
+        self._start()
+        receipt = uuid.uuid4().hex
+        try:
+            self._queue.put((op, model, values, receipt), timeout=self.put_timeout)
+        except queue.Full:
+            return None
+        return receipt
+
+    def _start(self):
+        # Started lazily so a forked worker gets its own thread rather than
+        # inheriting a dead one from the master process.
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            if self._thread is None:
+                atexit.register(self.drain)
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                first = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            time.sleep(self.flush_interval)
+            self._flush([first] + self._take(self.batch_size - 1))
+
+    def _take(self, limit):
+        items = []
+        while len(items) < limit:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _flush(self, items):
+        with self.app.app_context():
+            try:
+                self._write(items)
+            finally:
+                for _ in items:
+                    self._queue.task_done()
+
+    def _write(self, items):
+        try:
+            self._insert(items)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            if len(items) == 1:
+                self._dead_letter(*items[0], e)
+                return
+            # Find the bad rows by halving, so one bad row (say, a comment on a
+            # recipe deleted since it was queued) does not lose the others.
+            self.app.logger.warning('Write-behind batch of %d rows failed, retrying in halves: %s', len(items), e)
+            half = len(items) // 2
+            self._write(items[:half])
+            self._write(items[half:])
+
+    def _insert(self, items):
+        receipts = []
+        comments = [(values, receipt) for op, model, values, receipt in items if model is Comment]
+        if comments:
+            ids = db.session.execute(
+                db.insert(Comment).returning(Comment.id, sort_by_parameter_order=True),
+                [values for values, _ in comments]
+            ).scalars().all()
+            receipts += [
+                dict(receipt=receipt, user_id=values['user_id'], recipe_id=values['recipe_id'], model='comment', row_id=row_id, status='stored')
+                for (values, receipt), row_id in zip(comments, ids)
+            ]
+
+        # Only the last save or unsave of a (user, recipe) pair reaches the
+        # table; every receipt for the pair reports that outcome.
+        final, pair_receipts = {}, {}
+        for op, model, values, receipt in items:
+            if model is Save:
+                pair = (values['user_id'], values['recipe_id'])
+                final[pair] = op
+                pair_receipts.setdefault(pair, []).append(receipt)
+        saved = [pair for pair, op in final.items() if op == 'insert']
+        removed = [pair for pair, op in final.items() if op == 'delete']
+        save_ids = {}
+        if saved:
+            # An existing save is left alone; its id is looked up below.
+            db.session.execute(
+                upsert(Save).on_conflict_do_nothing(index_elements=['user_id', 'recipe_id']),
+                [{'user_id': user_id, 'recipe_id': recipe_id} for user_id, recipe_id in saved]
+            )
+            rows = db.session.execute(
+                db.select(Save.id, Save.user_id, Save.recipe_id).where(db.tuple_(Save.user_id, Save.recipe_id).in_(saved))
+            ).all()
+            save_ids = {(row.user_id, row.recipe_id): row.id for row in rows}
+        if removed:
+            db.session.execute(
+                db.delete(Save).where(db.tuple_(Save.user_id, Save.recipe_id).in_(removed)),
+                execution_options={'synchronize_session': False}
+            )
+        for pair, op in final.items():
+            status = 'stored' if op == 'insert' else 'deleted'
+            receipts += [
+                dict(receipt=receipt, user_id=pair[0], recipe_id=pair[1], model='save', row_id=save_ids.get(pair), status=status)
+                for receipt in pair_receipts[pair]
+            ]
+
+        if receipts:
+            db.session.execute(db.insert(WriteReceipt), receipts)
+
+    def _dead_letter(self, op, model, values, receipt, error):
+        error = str(getattr(error, 'orig', None) or error)
+        payload = json.dumps(dict(values, op=op), default=str)
+        self.app.logger.error('Write-behind %s %s failed and was dead-lettered: %s', model.__tablename__, receipt, error)
+        try:
+            db.session.add(DeadLetter(receipt=receipt, model=model.__tablename__, payload=payload, error=error))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            self.app.logger.exception('Could not store dead letter %s: %s', receipt, payload)
+
+    def drain(self):
+        """Stop the worker and write out everything still queued."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+        while True:
+            items = self._take(self.batch_size)
+            if not items:
+                break
+            self._flush(items)
+
+
+def init_app(app):
+    app.extensions['write_behind'] = WriteBehindQueue(
+        app,
+        maxsize=app.config['WRITE_BEHIND_MAX_SIZE'],
+        flush_interval=app.config['WRITE_BEHIND_FLUSH_INTERVAL'],
+        batch_size=app.config['WRITE_BEHIND_BATCH_SIZE'],
+        put_timeout=app.config['WRITE_BEHIND_PUT_TIMEOUT'],
+    )
@@ -1,6 +1,87 @@
 import os
+import tempfile
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 
 class Config:
-    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///' + os.path.join(basedir, 'app.db')
\ No newline at end of file
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///' + os.path.join(basedir, 'app.db')
+
+    # GET endpoints marked with read_replica query this database when set.
+    # Clients that just wrote stay on the primary for READ_AFTER_WRITE_WINDOW
+    # seconds.
+    SQLALCHEMY_BINDS = {'replica': os.environ['DATABASE_REPLICA_URL']} if os.environ.get('DATABASE_REPLICA_URL') else {}
+    READ_AFTER_WRITE_WINDOW = float(os.environ.get('READ_AFTER_WRITE_WINDOW', 5))
+
+    # Serve get_recipe/get_recipes from a read-only SQLite snapshot at this
+    # path. Workers rebuild it every SNAPSHOT_REBUILD_INTERVAL seconds (0 leaves
+    # it to `flask build-snapshot`) and fall back to the database when it is
+    # older than SNAPSHOT_MAX_STALENESS seconds.
+    SNAPSHOT_PATH = os.environ.get('SNAPSHOT_PATH')
+    SNAPSHOT_REBUILD_INTERVAL = float(os.environ.get('SNAPSHOT_REBUILD_INTERVAL', 60))
+    SNAPSHOT_MAX_STALENESS = float(os.environ.get('SNAPSHOT_MAX_STALENESS', 300))
+    SNAPSHOT_MMAP_SIZE = int(os.environ.get('SNAPSHOT_MMAP_SIZE', 256 * 1024 * 1024))
+
+    # Longest a request waits on an identical in-flight recipe read before
+    # loading the recipe itself.
+    SINGLEFLIGHT_TIMEOUT = float(os.environ.get('SINGLEFLIGHT_TIMEOUT', 5))
+
+    # Per-process concurrency limits per endpoint group as (running, waiting).
+    # Requests wait at most ADMISSION_TIMEOUT seconds for a slot and otherwise
+    # get 503 with Retry-After.
+    ADMISSION_CONTROL = os.environ.get('ADMISSION_CONTROL', '').lower() in ('1', 'true', 'yes')
+    ADMISSION_LIMITS = {
+        'listing': (2, 4),
+        'detail': (8, 16),
+        'auth': (4, 8),
+        'writes': (4, 8),
+    }
+    ADMISSION_TIMEOUT = float(os.environ.get('ADMISSION_TIMEOUT', 0.1))
+    ADMISSION_RETRY_AFTER = int(os.environ.get('ADMISSION_RETRY_AFTER', 1))
+
+    # Token-bucket limits as (tokens per second, burst), keyed by user when
+    # authenticated and by IP otherwise. The sqlite backend shares buckets
+    # between all workers on the host; memory keeps them per process.
+    RATELIMIT_ENABLED = os.environ.get('RATELIMIT_ENABLED', '').lower() in ('1', 'true', 'yes')
+    RATELIMIT_BACKEND = os.environ.get('RATELIMIT_BACKEND', 'sqlite')
+    RATELIMIT_SQLITE_PATH = os.environ.get('RATELIMIT_SQLITE_PATH') or os.path.join(tempfile.gettempdir(), 'basil-ratelimit.db')
+    RATELIMIT_RULES = {
+        'token': (0.2, 5),
+        'writes': (2, 20),
+    }
+
+    # Number of reverse proxies in front of the app (gunicorn.conf.py binds to
+    # localhost, so at least one in production). The client address used for
+    # anonymous rate limits is then taken from X-Forwarded-For; with 0 every
+    # client behind the proxy shares the proxy's bucket. Do not set it higher
+    # than the real number of proxies, or clients can spoof their address.
+    TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES', 0))
+
+    # Per-request stack sampling. A request is profiled when its X-Profile
+    # header matches PROFILING_TOKEN or, at random, for PROFILING_SAMPLE_RATE
+    # of requests; results go to PROFILING_DIR. The sampler cannot run more
+    # often than the interpreter switches threads (5 ms by default).
+    PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '').lower() in ('1', 'true', 'yes')
+    PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN')
+    PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+    PROFILING_INTERVAL = float(os.environ.get('PROFILING_INTERVAL', 0.005))
+    PROFILING_DIR = os.environ.get('PROFILING_DIR') or os.path.join(basedir, 'profiles')
+
+    # Queue comment and save inserts and commit them in batches from a
+    # background thread; the API answers 202 instead of 201.
+    WRITE_BEHIND = os.environ.get('WRITE_BEHIND', '').lower() in ('1', 'true', 'yes')
+    WRITE_BEHIND_MAX_SIZE = int(os.environ.get('WRITE_BEHIND_MAX_SIZE', 10000))
+    WRITE_BEHIND_FLUSH_INTERVAL = float(os.environ.get('WRITE_BEHIND_FLUSH_INTERVAL', 0.005))
+    WRITE_BEHIND_BATCH_SIZE = int(os.environ.get('WRITE_BEHIND_BATCH_SIZE', 500))
+    WRITE_BEHIND_PUT_TIMEOUT = float(os.environ.get('WRITE_BEHIND_PUT_TIMEOUT', 0.05))
+
+    # Users allowed to call admin endpoints such as POST /admin/users/bulk,
+    # as a comma-separated list of usernames. The bulk endpoint takes at most
+    # BULK_USERS_MAX users per request, so one request holds a web worker for
+    # seconds rather than a minute of scrypt hashing; use `flask import-users`
+    # for more.
+    # Each web worker hashes bulk passwords in its own pool of
+    # BULK_USERS_WORKERS processes, started on first use; keep it small, as
+    # there are already 2 * cores + 1 web workers.
+    ADMIN_USERNAMES = {name.strip() for name in os.environ.get('ADMIN_USERNAMES', '').split(',') if name.strip()}
+    BULK_USERS_MAX = int(os.environ.get('BULK_USERS_MAX', 100))
+    BULK_USERS_WORKERS = int(os.environ.get('BULK_USERS_WORKERS', 2))
@@ -0,0 +1,19 @@
+# gunicorn -c gunicorn.conf.py
+#
+# With preload_app the app is built once in the master and forked into the
+# workers, so imports and setup are paid once and shared copy-on-write.
+# post_fork then drops any pooled database connections the master opened,
+# so workers never share a connection.
+import multiprocessing
+import os
+
+wsgi_app = 'app:create_app()'
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1').lower() in ('1', 'true', 'yes')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+bind = os.environ.get('GUNICORN_BIND', '127.0.0.1:8000')
+
+
+def post_fork(server, worker):
+    from app import dispose_engines
+    dispose_engines(server.app.wsgi())
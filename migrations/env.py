@@ -5,6 +5,8 @@ from flask import current_app
 
 from alembic import context
 
+from migrations.online import CHECKPOINT_TABLE
+
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
@@ -94,6 +96,14 @@ def run_migrations_online():
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
 
+    # the chunked-migration checkpoint table (migrations/online.py) is not
+    # part of the models, so keep autogenerate from dropping it
+    def include_name(name, type_, parent_names):
+        return not (type_ == 'table' and name == CHECKPOINT_TABLE)
+
+    if conf_args.get("include_name") is None:
+        conf_args["include_name"] = include_name
+
     connectable = get_engine()
 
     with connectable.connect() as connection:
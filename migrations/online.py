@@ -0,0 +1,229 @@
+"""Helpers for data migrations that must not lock big tables.
+
+Use them from a revision instead of one large UPDATE or CREATE INDEX:
+
+    from migrations.online import backfill, create_index, drop_index, reset
+
+    def upgrade():
+        backfill('3f1a_trim_comment_body', 'comment', 'body = trim(body)', where='body <> trim(body)')
+        create_index('ix_comment_user_id', 'comment', ['user_id'])
+
+    def downgrade():
+        drop_index('ix_comment_user_id')
+        reset('3f1a_trim_comment_body')
+
+A backfill walks the table in primary-key order. Each chunk is updated and
+checkpointed in its own short transaction, under lock and statement
+timeouts, so a failed or interrupted run resumes where it stopped. Progress
+is kept under the name it is given, so make names unique across revisions,
+e.g. by starting them with the revision id. Inside a revision the helpers
+commit the migration transaction first (Alembic's autocommit_block). Anything that ran before them in the same revision is
+already committed when they start, so put backfills in their own revision
+or make the earlier steps safe to repeat.
+
+Pass `bind=` (an Engine or Connection) to run them outside Alembic.
+"""
+import logging
+import time
+from contextlib import contextmanager
+import sqlalchemy as sa
+from sqlalchemy.exc import OperationalError
+
+logger = logging.getLogger('alembic.online')
+
+CHUNK_SIZE = 1000
+LOCK_TIMEOUT = 2
+STATEMENT_TIMEOUT = 30
+RETRIES = 5
+LOG_INTERVAL = 5
+# Sleep between chunks so other writers get the lock (SQLite locks the whole
+# database) and replicas keep up.
+PAUSE = 0.005
+
+# Progress of every chunked migration, keyed by name. Autogenerate is told to
+# leave this table alone (see env.py).
+CHECKPOINT_TABLE = 'online_migration'
+
+metadata = sa.MetaData()
+checkpoint = sa.Table(
+    CHECKPOINT_TABLE, metadata,
+    sa.Column('name', sa.String(128), primary_key=True),
+    sa.Column('last_key', sa.BigInteger),
+    sa.Column('rows', sa.BigInteger, nullable=False, default=0),
+    sa.Column('updated_at', sa.DateTime, nullable=False),
+    sa.Column('finished_at', sa.DateTime),
+)
+
+
+@contextmanager
+def _engine(bind):
+    if bind is not None:
+        yield bind.engine
+        return
+    from alembic import op
+    with op.get_context().autocommit_block():
+        yield op.get_bind().engine
+
+
+def _now():
+    return sa.func.current_timestamp()
+
+
+def _set_timeouts(conn, lock_timeout, statement_timeout):
+    if conn.dialect.name == 'postgresql':
+        # set_config(..., true) is SET LOCAL: it ends with the transaction.
+        conn.execute(sa.text("SELECT set_config('lock_timeout', :v, true)"), {'v': f'{int(lock_timeout * 1000)}ms'})
+        conn.execute(sa.text("SELECT set_config('statement_timeout', :v, true)"), {'v': f'{int(statement_timeout * 1000)}ms'})
+    elif conn.dialect.name == 'sqlite':
+        # SQLite has no statement timeout; busy_timeout bounds the lock wait.
+        conn.execute(sa.text(f'PRAGMA busy_timeout = {int(lock_timeout * 1000)}'))
+
+
+def set_timeouts(lock_timeout=LOCK_TIMEOUT, statement_timeout=STATEMENT_TIMEOUT, bind=None):
+    """Bound lock waits and statement time for the rest of the current
+    migration transaction, e.g. before an ALTER TABLE on a busy table, so it
+    fails fast instead of queueing every other query behind it."""
+    if bind is None:
+        from alembic import op
+        bind = op.get_bind()
+    _set_timeouts(bind, lock_timeout, statement_timeout)
+
+
+def _retrying(what, retries, attempt_fn):
+    for attempt in range(retries + 1):
+        try:
+            return attempt_fn()
+        except OperationalError as e:
+            # Lock and statement timeouts surface as OperationalError on both
+            # psycopg2 and sqlite3. Back off and let the blocking query finish.
+            if attempt == retries:
+                raise
+            delay = min(0.1 * 2 ** attempt, 5)
+            logger.warning('%s: %s; retrying in %.1fs', what, e.orig, delay)
+            time.sleep(delay)
+
+
+def run_in_chunks(name, table, statement, params=None, key='id', chunk_size=CHUNK_SIZE,
+                  lock_timeout=LOCK_TIMEOUT, statement_timeout=STATEMENT_TIMEOUT,
+                  retries=RETRIES, pause=PAUSE, bind=None):
+    """Run `statement` once per chunk of `chunk_size` rows of `table`, in
+    `key` order. The statement is SQL with :lo and :hi placeholders and must
+    only touch rows with lo < key <= hi; {table} and {key} in it are replaced
+    with the quoted names. Progress is saved under `name`, and a finished
+    migration is not run again. Returns the total rowcount."""
+    with _engine(bind) as engine:
+        quote = engine.dialect.identifier_preparer.quote
+        t, k = quote(table), quote(key)
+        statement = sa.text(statement.format(table=t, key=k))
+        next_bound = sa.text(
+            f'SELECT max({k}) FROM (SELECT {k} FROM {t} WHERE {k} > :lo ORDER BY {k} LIMIT :n) AS chunk'
+        )
+
+        with engine.begin() as conn:
+            metadata.create_all(conn, checkfirst=True)
+            state = conn.execute(sa.select(checkpoint).where(checkpoint.c.name == name)).first()
+            if state is None:
+                conn.execute(checkpoint.insert().values(name=name, rows=0, updated_at=_now()))
+                state = conn.execute(sa.select(checkpoint).where(checkpoint.c.name == name)).first()
+            if state.finished_at is not None:
+                logger.info('%s: already finished, skipping', name)
+                return state.rows
+            lo, rows = state.last_key, state.rows
+            first, last = conn.execute(sa.text(f'SELECT min({k}), max({k}) FROM {t}')).first()
+        if lo is not None:
+            logger.info('%s: resuming after %s=%s (%d rows done)', name, key, lo, rows)
+        else:
+            lo = first - 1 if first is not None else 0
+        start, started, logged = lo, time.monotonic(), time.monotonic()
+
+        def chunk():
+            with engine.begin() as conn:
+                _set_timeouts(conn, lock_timeout, statement_timeout)
+                hi = conn.execute(next_bound, {'lo': lo, 'n': chunk_size}).scalar()
+                if hi is None:
+                    conn.execute(checkpoint.update().where(checkpoint.c.name == name)
+                                 .values(updated_at=_now(), finished_at=_now()))
+                    return None, 0
+                count = conn.execute(statement, {**(params or {}), 'lo': lo, 'hi': hi}).rowcount
+                conn.execute(checkpoint.update().where(checkpoint.c.name == name)
+                             .values(last_key=hi, rows=checkpoint.c.rows + count, updated_at=_now()))
+                return hi, count
+
+        while True:
+            hi, count = _retrying(f'{name} after {key}={lo}', retries, chunk)
+            if hi is None:
+                break
+            lo, rows = hi, rows + count
+            if time.monotonic() - logged >= LOG_INTERVAL:
+                logged = time.monotonic()
+                done = (lo - start) / max(last - start, 1) if last is not None else 1
+                logger.info('%s: %s=%s of %s (%.0f%%), %d rows', name, key, lo, last, 100 * min(done, 1), rows)
+            if pause:
+                time.sleep(pause)
+        logger.info('%s: finished, %d rows in %.1fs', name, rows, time.monotonic() - started)
+        return rows
+
+
+def backfill(name, table, set_, where=None, params=None, key='id', **kwargs):
+    """UPDATE `table` SET `set_` [WHERE `where`] in chunks, with progress
+    saved under `name`; see run_in_chunks. `where` only filters rows inside
+    each key range, so it needs no index."""
+    escape = lambda sql: sql.replace('{', '{{').replace('}', '}}')
+    statement = 'UPDATE {table} SET ' + escape(set_) + ' WHERE {key} > :lo AND {key} <= :hi'
+    if where:
+        statement += ' AND (' + escape(where) + ')'
+    return run_in_chunks(name, table, statement, params=params, key=key, **kwargs)
+
+
+def reset(name, bind=None):
+    """Forget the progress saved under `name`, e.g. in a downgrade, so the
+    next upgrade runs the migration again from the start."""
+    with _engine(bind) as engine, engine.begin() as conn:
+        if sa.inspect(conn).has_table(CHECKPOINT_TABLE):
+            conn.execute(checkpoint.delete().where(checkpoint.c.name == name))
+
+
+def create_index(name, table, columns, unique=False, lock_timeout=LOCK_TIMEOUT, retries=RETRIES, bind=None):
+    """Create an index without blocking writes: CREATE INDEX CONCURRENTLY on
+    Postgres, a plain CREATE INDEX elsewhere. Safe to re-run; an invalid
+    index left by a failed concurrent build is dropped and rebuilt."""
+    with _engine(bind) as engine:
+        quote = engine.dialect.identifier_preparer.quote
+        cols = ', '.join(quote(c) for c in columns)
+        kind = 'UNIQUE INDEX' if unique else 'INDEX'
+        postgres = engine.dialect.name == 'postgresql'
+
+        def build():
+            with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                if not postgres:
+                    conn.execute(sa.text(f'CREATE {kind} IF NOT EXISTS {quote(name)} ON {quote(table)} ({cols})'))
+                    return
+                # The build itself may take long; only waiting for locks is bounded.
+                conn.execute(sa.text(f"SET lock_timeout = '{int(lock_timeout * 1000)}ms'"))
+                conn.execute(sa.text('SET statement_timeout = 0'))
+                valid = conn.execute(
+                    sa.text('SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)'),
+                    {'name': quote(name)}
+                ).scalar()
+                if valid is False:
+                    logger.info('%s: dropping invalid index from an earlier attempt', name)
+                    conn.execute(sa.text(f'DROP INDEX CONCURRENTLY IF EXISTS {quote(name)}'))
+                conn.execute(sa.text(f'CREATE {kind} CONCURRENTLY IF NOT EXISTS {quote(name)} ON {quote(table)} ({cols})'))
+
+        started = time.monotonic()
+        _retrying(f'index {name}', retries, build)
+        logger.info('%s: index built in %.1fs', name, time.monotonic() - started)
+
+
+def drop_index(name, lock_timeout=LOCK_TIMEOUT, retries=RETRIES, bind=None):
+    with _engine(bind) as engine:
+        quote = engine.dialect.identifier_preparer.quote
+        concurrently = 'CONCURRENTLY ' if engine.dialect.name == 'postgresql' else ''
+
+        def drop():
+            with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                if concurrently:
+                    conn.execute(sa.text(f"SET lock_timeout = '{int(lock_timeout * 1000)}ms'"))
+                conn.execute(sa.text(f'DROP INDEX {concurrently}IF EXISTS {quote(name)}'))
+
+        _retrying(f'index {name}', retries, drop)
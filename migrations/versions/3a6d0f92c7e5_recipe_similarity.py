@@ -0,0 +1,32 @@
+"""Add recipe_similarity table
+
+Revision ID: 3a6d0f92c7e5
+Revises: e1c97b3d54a8
+Create Date: 2026-10-19 12:58:14.296501
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3a6d0f92c7e5'
+down_revision = 'e1c97b3d54a8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('recipe_similarity',
+    sa.Column('recipe_id', sa.Integer(), nullable=False),
+    sa.Column('rank', sa.Integer(), nullable=False),
+    sa.Column('similar_recipe_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['recipe_id'], ['recipe.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['similar_recipe_id'], ['recipe.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('recipe_id', 'rank')
+    )
+
+
+def downgrade():
+    op.drop_table('recipe_similarity')
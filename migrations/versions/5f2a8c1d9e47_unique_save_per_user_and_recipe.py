@@ -0,0 +1,32 @@
+"""Unique save per user and recipe
+
+Revision ID: 5f2a8c1d9e47
+Revises: 1323065113fd
+Create Date: 2026-10-19 09:12:31.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5f2a8c1d9e47'
+down_revision = '1323065113fd'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Drop duplicate saves left behind by the old check-then-insert route,
+    # keeping the earliest row for each (user_id, recipe_id) pair.
+    op.execute(
+        'DELETE FROM save WHERE id NOT IN '
+        '(SELECT MIN(id) FROM save GROUP BY user_id, recipe_id)'
+    )
+    with op.batch_alter_table('save', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_save_user_id_recipe_id', ['user_id', 'recipe_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('save', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_save_user_id_recipe_id', type_='unique')
@@ -0,0 +1,37 @@
+"""Index recipe cuisine and add cuisine_count aggregate
+
+Revision ID: 7c4b19e2a0f3
+Revises: 3a6d0f92c7e5
+Create Date: 2026-10-19 14:07:45.861229
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c4b19e2a0f3'
+down_revision = '3a6d0f92c7e5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('recipe', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_recipe_cuisine'), ['cuisine'], unique=False)
+
+    op.create_table('cuisine_count',
+    sa.Column('cuisine', sa.String(), nullable=False),
+    sa.Column('recipe_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('cuisine')
+    )
+    op.execute(
+        'INSERT INTO cuisine_count (cuisine, recipe_count) '
+        'SELECT cuisine, COUNT(*) FROM recipe GROUP BY cuisine'
+    )
+
+
+def downgrade():
+    op.drop_table('cuisine_count')
+    with op.batch_alter_table('recipe', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_recipe_cuisine'))
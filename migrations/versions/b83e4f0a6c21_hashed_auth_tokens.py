@@ -0,0 +1,52 @@
+"""Move tokens to a hashed auth_token table
+
+Revision ID: b83e4f0a6c21
+Revises: 5f2a8c1d9e47
+Create Date: 2026-10-19 10:41:07.118350
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b83e4f0a6c21'
+down_revision = '5f2a8c1d9e47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('auth_token',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('token_hash', sa.String(length=64), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('date_created', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('auth_token', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_auth_token_token_hash'), ['token_hash'], unique=True)
+        batch_op.create_index(batch_op.f('ix_auth_token_user_id'), ['user_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_auth_token_expires_at'), ['expires_at'], unique=False)
+
+    # Plaintext tokens are not carried over; clients sign in again.
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_user_token'))
+        batch_op.drop_column('token_expiration')
+        batch_op.drop_column('token')
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('token', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('token_expiration', sa.DateTime(timezone=True), nullable=True))
+        batch_op.create_index(batch_op.f('ix_user_token'), ['token'], unique=True)
+
+    with op.batch_alter_table('auth_token', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_auth_token_expires_at'))
+        batch_op.drop_index(batch_op.f('ix_auth_token_user_id'))
+        batch_op.drop_index(batch_op.f('ix_auth_token_token_hash'))
+
+    op.drop_table('auth_token')
@@ -0,0 +1,48 @@
+"""Store write-behind receipts and failed writes
+
+Revision ID: d2f5a9c3e1b7
+Revises: 7c4b19e2a0f3
+Create Date: 2026-10-19 18:21:07.519342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2f5a9c3e1b7'
+down_revision = '7c4b19e2a0f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('write_receipt',
+    sa.Column('receipt', sa.String(length=32), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('recipe_id', sa.Integer(), nullable=False),
+    sa.Column('model', sa.String(), nullable=False),
+    sa.Column('row_id', sa.Integer(), nullable=True),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.PrimaryKeyConstraint('receipt')
+    )
+
+    op.create_table('dead_letter',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('receipt', sa.String(length=32), nullable=False),
+    sa.Column('model', sa.String(), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('error', sa.Text(), nullable=False),
+    sa.Column('date_created', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('dead_letter', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_dead_letter_receipt'), ['receipt'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('dead_letter', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_dead_letter_receipt'))
+
+    op.drop_table('dead_letter')
+    op.drop_table('write_receipt')
@@ -0,0 +1,26 @@
+"""Index instructions by recipe and step number
+
+Revision ID: e1c97b3d54a8
+Revises: b83e4f0a6c21
+Create Date: 2026-10-19 11:26:52.730914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1c97b3d54a8'
+down_revision = 'b83e4f0a6c21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('instruction', schema=None) as batch_op:
+        batch_op.create_index('ix_instruction_recipe_id_stepNumber', ['recipe_id', 'stepNumber'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('instruction', schema=None) as batch_op:
+        batch_op.drop_index('ix_instruction_recipe_id_stepNumber')
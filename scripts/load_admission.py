@@ -0,0 +1,141 @@
+"""Local load test for admission control.
+
+Serves the app on a temporary SQLite database and floods the expensive
+endpoints (recipe listings and, with --token-storm, /token) from many
+threads, while one client measures latency of the cheap GET /users/me.
+Runs once with ADMISSION_CONTROL off and once with it on:
+
+    python scripts/load_admission.py --seconds 8 --token-storm
+"""
+import argparse
+import http.client
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from base64 import b64encode
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.serving import make_server
+from app import create_app, db
+from app.models import Recipe, User
+from config import Config
+
+
+def build_app(path, admission, args):
+    config = type('LoadConfig', (Config,), {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+        'SQLALCHEMY_BINDS': {},
+        'ADMISSION_CONTROL': admission,
+        'ADMISSION_LIMITS': dict(Config.ADMISSION_LIMITS, auth=(args.auth_limit, 2 * args.auth_limit)),
+        'RATELIMIT_ENABLED': False,
+    })
+    app = create_app(config)
+    with app.app_context():
+        # WAL lets readers run alongside /token's inserts, as they would on
+        # Postgres; in rollback-journal mode every reader waits on them.
+        db.session.execute(db.text('PRAGMA journal_mode = WAL'))
+        db.create_all()
+        if db.session.get(User, 1) is None:
+            user = User(first_name='Load', last_name='Test', username='load', email='load@example.com', password='password')
+            for n in range(args.recipes):
+                db.session.add(Recipe(name=f'Recipe {n}', cuisine=f'Cuisine {n % 20}', cookTime='10', servings='2', user_id=user.id))
+            db.session.commit()
+        token = db.session.get(User, 1).get_token()['token']
+    return app, token
+
+
+def serve(path, admission, args, ready):
+    app, token = build_app(path, admission, args)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    ready.put((server.server_port, token))
+    server.serve_forever()
+
+
+def flood(port, args, stop, results):
+    counts = Counter()
+    basic = 'Basic ' + b64encode(b'load:password').decode()
+
+    def hammer(path, headers):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        while not stop.is_set():
+            try:
+                conn.request('GET', path.format(random.random()), headers=headers)
+                response = conn.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                continue
+            counts[f"{path.split('?')[0]} {response.status}"] += 1
+            if response.status == 503:
+                time.sleep(0.05)
+
+    targets = [('/recipes?x={}', {})] * args.threads
+    if args.token_storm:
+        targets += [('/token', {'Authorization': basic})] * args.threads
+    threads = [threading.Thread(target=hammer, args=target, daemon=True) for target in targets]
+    for thread in threads:
+        thread.start()
+    stop.wait()
+    results.put(dict(counts))
+
+
+def run(path, admission, args):
+    # Server, flooding clients and the measured client each get their own
+    # process, so they do not queue on one another's GIL.
+    ctx = multiprocessing.get_context('spawn')
+    ready, results, stop = ctx.Queue(), ctx.Queue(), ctx.Event()
+    server = ctx.Process(target=serve, args=(path, admission, args, ready), daemon=True)
+    server.start()
+    port, token = ready.get()
+    flooder = ctx.Process(target=flood, args=(port, args, stop, results), daemon=True)
+    flooder.start()
+    time.sleep(1)
+
+    latencies, statuses = [], Counter()
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    deadline = time.time() + args.seconds
+    while time.time() < deadline:
+        started = time.perf_counter()
+        conn.request('GET', '/users/me', headers={'Authorization': f'Bearer {token}'})
+        response = conn.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - started)
+        statuses[response.status] += 1
+        time.sleep(0.01)
+    stop.set()
+    heavy = results.get()
+    flooder.join()
+    server.terminate()
+    server.join()
+
+    latencies.sort()
+    return [latencies[int(len(latencies) * q)] * 1000 for q in (0.5, 0.9, 0.99)], statuses, heavy
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=8, help='How long to measure GET /users/me.')
+    parser.add_argument('--threads', type=int, default=24, help='Flooding threads per expensive endpoint.')
+    parser.add_argument('--recipes', type=int, default=400, help='Recipes seeded, i.e. the size of each listing.')
+    parser.add_argument('--token-storm', action='store_true', help='Also flood GET /token.')
+    parser.add_argument('--auth-limit', type=int, default=Config.ADMISSION_LIMITS['auth'][0],
+                        help='Concurrent password checks admitted; at most the number of cores keeps CPU for cheap requests.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'load.db')
+        for admission in (False, True):
+            (p50, p90, p99), statuses, heavy = run(path, admission, args)
+            print(f"admission {'on ' if admission else 'off'}: GET /users/me p50={p50:.1f}ms p90={p90:.1f}ms p99={p99:.1f}ms "
+                  f"{dict(statuses)}; flood {dict(heavy)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+import pytest
+from app import create_app, db
+from app.models import User, Recipe
+from config import Config
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Build an app on a fresh SQLite file; keyword arguments override config."""
+    apps = []
+
+    def make_app(**overrides):
+        config = type('TestConfig', (Config,), {
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'app.db'}",
+            'SQLALCHEMY_BINDS': {},
+            **overrides,
+        })
+        app = create_app(config)
+        with app.app_context():
+            # Primary only: a replica bind registered by one test stays on the
+            # shared `db` and would not be configured in the next app.
+            db.create_all(bind_key=None)
+        apps.append(app)
+        return app
+
+    yield make_app
+    for app in apps:
+        with app.app_context():
+            db.session.remove()
+            for engine in db.engines.values():
+                engine.dispose()
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def make_user(app):
+    """Create a user and return (user id, Authorization header)."""
+    def make_user(username):
+        with app.app_context():
+            user = User(first_name='Test', last_name='User', username=username, email=f'{username}@example.com', password='password')
+            token = user.get_token()['token']
+            return user.id, {'Authorization': f'Bearer {token}'}
+    return make_user
+
+
+@pytest.fixture
+def make_recipe(app):
+    def make_recipe(user_id, name='Pesto', cuisine='Italian'):
+        with app.app_context():
+            return Recipe(name=name, cuisine=cuisine, cookTime='10', servings='2', user_id=user_id).id
+    return make_recipe
@@ -0,0 +1,32 @@
+from app import db
+from app.models import Instruction
+
+
+def add_steps(app, recipe_id, user_id, count):
+    with app.app_context():
+        return [Instruction(stepNumber=n, body=f'step {n}', recipe_id=recipe_id, user_id=user_id).id for n in range(1, count + 1)]
+
+
+def test_reorder_instructions(app, make_user, make_recipe):
+    user_id, headers = make_user('cook')
+    recipe_id = make_recipe(user_id)
+    ids = add_steps(app, recipe_id, user_id, 3)
+    order = [ids[2], ids[0], ids[1]]
+
+    response = app.test_client().put(f'/recipes/{recipe_id}/instructions/order', json={'instructionIds': order}, headers=headers)
+    assert response.status_code == 200
+    assert [(step['id'], step['stepNumber']) for step in response.get_json()] == [(order[0], 1), (order[1], 2), (order[2], 3)]
+
+
+def test_reorder_rejects_bad_ids(app, make_user, make_recipe):
+    user_id, headers = make_user('cook')
+    recipe_id = make_recipe(user_id)
+    ids = add_steps(app, recipe_id, user_id, 3)
+    client = app.test_client()
+    url = f'/recipes/{recipe_id}/instructions/order'
+
+    for body in ({'instructionIds': [{}, {}, {}]}, {'instructionIds': 'abc'}, {'instructionIds': ids[:2]}, {'instructionIds': [ids[0]] * 3}, ids):
+        assert client.put(url, json=body, headers=headers).status_code == 400
+    with app.app_context():
+        steps = db.session.execute(db.select(Instruction.stepNumber).order_by(Instruction.id)).scalars().all()
+    assert steps == [1, 2, 3]
@@ -0,0 +1,74 @@
+import pytest
+import sqlalchemy as sa
+from migrations.online import backfill, checkpoint, reset
+
+ROWS = 50000
+NAME = 'trim_comment_body'
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'big.db'}")
+    with engine.begin() as conn:
+        conn.execute(sa.text('CREATE TABLE comment (id INTEGER PRIMARY KEY, body VARCHAR NOT NULL)'))
+        conn.execute(
+            sa.text('INSERT INTO comment (body) VALUES (:body)'),
+            [{'body': f'  padded {n}  ' if n % 2 else f'clean {n}'} for n in range(ROWS)]
+        )
+    yield engine
+    engine.dispose()
+
+
+def padded(engine):
+    with engine.connect() as conn:
+        return conn.execute(sa.text('SELECT count(*) FROM comment WHERE body <> trim(body)')).scalar()
+
+
+def progress(engine, name=NAME):
+    with engine.connect() as conn:
+        return conn.execute(sa.select(checkpoint).where(checkpoint.c.name == name)).one()
+
+
+def test_backfill(engine):
+    assert padded(engine) == ROWS // 2
+    assert backfill(NAME, 'comment', 'body = trim(body)', where='body <> trim(body)', chunk_size=1000, pause=0, bind=engine) == ROWS // 2
+    assert padded(engine) == 0
+
+    state = progress(engine)
+    assert (state.last_key, state.rows) == (ROWS, ROWS // 2)
+    assert state.finished_at is not None
+
+    # Finished migrations are not run again until reset.
+    assert backfill(NAME, 'comment', 'body = trim(body)', chunk_size=1000, pause=0, bind=engine) == ROWS // 2
+    reset(NAME, bind=engine)
+    assert backfill(NAME, 'comment', 'body = trim(body)', chunk_size=1000, pause=0, bind=engine) == ROWS
+
+
+def test_backfill_resumes_after_failure(engine):
+    with engine.begin() as conn:
+        conn.execute(sa.text(
+            "CREATE TRIGGER fail_once BEFORE UPDATE ON comment WHEN NEW.id = 20500 "
+            "BEGIN SELECT RAISE(ABORT, 'injected failure'); END"
+        ))
+    with pytest.raises(sa.exc.IntegrityError, match='injected failure'):
+        backfill(NAME, 'comment', 'body = trim(body)', where='body <> trim(body)', chunk_size=1000, pause=0, bind=engine)
+
+    # Chunks before the failing one are committed and checkpointed; the
+    # failing chunk rolled back as a whole.
+    state = progress(engine)
+    assert (state.last_key, state.rows, state.finished_at) == (20000, 10000, None)
+    assert padded(engine) == ROWS // 2 - 10000
+
+    with engine.begin() as conn:
+        conn.execute(sa.text('DROP TRIGGER fail_once'))
+    assert backfill(NAME, 'comment', 'body = trim(body)', where='body <> trim(body)', chunk_size=1000, pause=0, bind=engine) == ROWS // 2
+    assert padded(engine) == 0
+    assert progress(engine).finished_at is not None
+
+
+def test_backfills_on_one_table_keep_separate_progress(engine):
+    assert backfill(NAME, 'comment', 'body = trim(body)', where='body <> trim(body)', chunk_size=1000, pause=0, bind=engine) == ROWS // 2
+    assert backfill('upper_comment_body', 'comment', 'body = upper(body)', chunk_size=1000, pause=0, bind=engine) == ROWS
+    with engine.connect() as conn:
+        assert conn.execute(sa.text("SELECT count(*) FROM comment WHERE body LIKE 'CLEAN %' OR body LIKE 'PADDED %'")).scalar() == ROWS
+    assert progress(engine, 'upper_comment_body').finished_at is not None
@@ -0,0 +1,16 @@
+import pytest
+
+
+@pytest.fixture
+def app(make_app, tmp_path):
+    return make_app(PROFILING_ENABLED=True, PROFILING_TOKEN='secret', PROFILING_DIR=str(tmp_path / 'profiles'))
+
+
+def test_profile_token(app, tmp_path):
+    client = app.test_client()
+    assert client.get('/cuisines', headers={'X-Profile': 'café'}).status_code == 200
+    assert client.get('/cuisines', headers={'X-Profile': 'wrong'}).status_code == 200
+    assert not (tmp_path / 'profiles').exists()
+
+    assert client.get('/cuisines', headers={'X-Profile': 'secret'}).status_code == 200
+    assert len(list((tmp_path / 'profiles').glob('*.collapsed'))) == 1
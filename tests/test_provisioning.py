@@ -0,0 +1,45 @@
+import pytest
+from app import db
+from app.models import User
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app(ADMIN_USERNAMES={'admin'}, BULK_USERS_MAX=10)
+
+
+def user(name, **fields):
+    return {'firstName': 'Bulk', 'lastName': 'User', 'username': name, 'email': f'{name}@example.com', 'password': 'pw', **fields}
+
+
+def test_bulk_create_users(app, make_user):
+    make_user('taken')
+    _, admin = make_user('admin')
+    client = app.test_client()
+    users = [user('new1'), user('new2'), user('taken'), user('new1', email='other@example.com'), user('badpw', password=5), {'username': 'partial'}]
+
+    response = client.post('/admin/users/bulk', json={'users': users}, headers=admin)
+    assert response.status_code == 201
+    body = response.get_json()
+    assert body['created'] == 2
+    assert {(s['username'], s['reason'].split(':')[0]) for s in body['skipped']} == {
+        ('taken', 'already exists'),
+        ('new1', 'duplicate in import'),
+        ('badpw', 'missing or not a string'),
+        ('partial', 'missing or not a string'),
+    }
+    assert client.get('/token', auth=('new2', 'pw')).status_code == 200
+    with app.app_context():
+        assert db.session.execute(db.select(db.func.count(User.id))).scalar() == 4
+
+
+def test_bulk_create_rejects_bad_requests(app, make_user):
+    _, member = make_user('member')
+    _, admin = make_user('admin')
+    client = app.test_client()
+    url = '/admin/users/bulk'
+
+    assert client.post(url, json={'users': [user('x')]}, headers=member).status_code == 403
+    assert client.post(url, json=[user('x')], headers=admin).status_code == 400
+    assert client.post(url, json={'users': ['x']}, headers=admin).status_code == 400
+    assert client.post(url, json={'users': [user(f'u{n}') for n in range(11)]}, headers=admin).status_code == 413
@@ -0,0 +1,33 @@
+import sqlite3
+import pytest
+
+
+@pytest.fixture
+def make_limited_app(make_app, tmp_path):
+    def make_limited_app(**overrides):
+        return make_app(RATELIMIT_ENABLED=True, RATELIMIT_SQLITE_PATH=str(tmp_path / 'ratelimit.db'), **overrides)
+    return make_limited_app
+
+
+def test_forwarded_clients_get_their_own_buckets(make_limited_app):
+    client = make_limited_app(TRUSTED_PROXIES=1).test_client()
+    burst = client.application.config['RATELIMIT_RULES']['token'][1]
+
+    for _ in range(burst):
+        assert client.get('/token', headers={'X-Forwarded-For': '203.0.113.1'}).status_code == 401
+    assert client.get('/token', headers={'X-Forwarded-For': '203.0.113.1'}).status_code == 429
+    assert client.get('/token', headers={'X-Forwarded-For': '203.0.113.2'}).status_code == 401
+
+
+def test_locked_bucket_store_fails_open(make_limited_app, tmp_path):
+    client = make_limited_app().test_client()
+    assert client.get('/token').status_code == 401
+
+    lock = sqlite3.connect(tmp_path / 'ratelimit.db', isolation_level=None)
+    lock.execute('BEGIN IMMEDIATE')
+    try:
+        response = client.get('/token')
+    finally:
+        lock.execute('ROLLBACK')
+    assert response.status_code == 401
+    assert 'RateLimit-Limit' not in response.headers
@@ -0,0 +1,19 @@
+from app import db
+from app.models import RecipeSimilarity
+
+
+def test_delete_recipe_removes_its_neighbours(app, make_user, make_recipe):
+    user_id, headers = make_user('cook')
+    pesto, pasta, salad = (make_recipe(user_id, name) for name in ('Pesto', 'Pasta', 'Salad'))
+    with app.app_context():
+        db.session.add_all([
+            RecipeSimilarity(recipe_id=pesto, rank=1, similar_recipe_id=pasta, score=0.9),
+            RecipeSimilarity(recipe_id=pasta, rank=1, similar_recipe_id=pesto, score=0.9),
+            RecipeSimilarity(recipe_id=pasta, rank=2, similar_recipe_id=salad, score=0.1),
+        ])
+        db.session.commit()
+
+    assert app.test_client().delete(f'/recipes/{pesto}', headers=headers).status_code == 200
+    with app.app_context():
+        left = db.session.execute(db.select(RecipeSimilarity.recipe_id, RecipeSimilarity.similar_recipe_id)).all()
+    assert left == [(pasta, salad)]
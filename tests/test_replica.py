@@ -0,0 +1,40 @@
+import sqlite3
+import pytest
+from app import db
+
+
+@pytest.fixture
+def app(make_app, tmp_path):
+    return make_app(SQLALCHEMY_BINDS={'replica': f"sqlite:///{tmp_path / 'replica.db'}"})
+
+
+def snapshot_replica(app, tmp_path):
+    """Copy the primary into the replica file, as a replica that stops
+    replicating right now would look."""
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+    with sqlite3.connect(tmp_path / 'app.db') as primary, sqlite3.connect(tmp_path / 'replica.db') as replica:
+        primary.backup(replica)
+    primary.close()
+    replica.close()
+
+
+def test_writer_reads_primary_until_replica_catches_up(app, make_user, make_recipe, tmp_path):
+    user_id, headers = make_user('cook')
+    recipe_id = make_recipe(user_id)
+    snapshot_replica(app, tmp_path)
+
+    writer = app.test_client()
+    response = writer.post(f'/recipes/{recipe_id}/ingredients', json={'name': 'Basil', 'quantity': '2', 'unit': 'cups'}, headers=headers)
+    assert response.status_code == 201
+    assert writer.get_cookie('read_primary_until') is not None
+
+    # Anyone else reads the replica, which has not seen the write yet.
+    assert app.test_client().get(f'/recipes/{recipe_id}/ingredients/').status_code == 404
+    # The writer reads its own write from the primary.
+    ingredients = writer.get(f'/recipes/{recipe_id}/ingredients/').get_json()
+    assert [i['name'] for i in ingredients] == ['Basil']
+
+    writer.delete_cookie('read_primary_until')
+    assert writer.get(f'/recipes/{recipe_id}/ingredients/').status_code == 404
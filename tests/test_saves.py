@@ -0,0 +1,32 @@
+import threading
+from collections import Counter
+from app import db
+from app.models import Save
+
+
+def test_parallel_saves_create_one_row(app, make_user, make_recipe):
+    user_id, headers = make_user('saver')
+    recipe_id = make_recipe(user_id)
+    statuses = []
+    start = threading.Barrier(16)
+
+    def save():
+        client = app.test_client()
+        start.wait()
+        statuses.append(client.post(f'/recipes/{recipe_id}/save', headers=headers).status_code)
+
+    threads = [threading.Thread(target=save) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert Counter(statuses) == {201: 1, 200: 15}
+    with app.app_context():
+        count = db.session.execute(db.select(db.func.count(Save.id)).where(Save.recipe_id == recipe_id)).scalar()
+    assert count == 1
+
+
+def test_save_missing_recipe(app, make_user):
+    _, headers = make_user('saver')
+    assert app.test_client().post('/recipes/999/save', headers=headers).status_code == 404
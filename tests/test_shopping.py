@@ -0,0 +1,10 @@
+def test_shopping_list_rejects_bad_servings(app, make_user, make_recipe):
+    user_id, headers = make_user('cook')
+    recipe_id = make_recipe(user_id)
+    client = app.test_client()
+    url = '/users/me/shopping-list'
+
+    for query in (f'recipes={recipe_id}&servings=nan', f'recipes={recipe_id}&servings=inf',
+                  f'recipes={recipe_id}&servings=0', f'recipes={recipe_id}&servings=-2', 'servings=2,4'):
+        assert client.get(f'{url}?{query}', headers=headers).status_code == 400
+    assert client.get(f'{url}?recipes={recipe_id}&servings=4', headers=headers).status_code == 200
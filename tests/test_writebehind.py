@@ -0,0 +1,93 @@
+import pytest
+from app import db
+from app.models import Comment, DeadLetter, Save
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app(WRITE_BEHIND=True)
+
+
+def test_bad_row_does_not_drop_its_batch(app, make_user, make_recipe):
+    user_id, headers = make_user('writer')
+    recipe_id = make_recipe(user_id)
+    client = app.test_client()
+    queue = app.extensions['write_behind']
+
+    assert client.post(f'/recipes/{recipe_id}/comments', json={'body': None}, headers=headers).status_code == 400
+
+    first = client.post(f'/recipes/{recipe_id}/comments', json={'body': 'valid-A'}, headers=headers)
+    # Skips the route's validation to get a row the database rejects.
+    bad = queue.put(Comment, {'body': None, 'user_id': user_id, 'recipe_id': recipe_id})
+    second = client.post(f'/recipes/{recipe_id}/comments', json={'body': 'valid-B'}, headers=headers)
+    assert first.status_code == second.status_code == 202
+    queue.drain()
+
+    with app.app_context():
+        bodies = db.session.execute(db.select(Comment.body).order_by(Comment.id)).scalars().all()
+        failed = db.session.execute(db.select(DeadLetter)).scalars().all()
+    assert bodies == ['valid-A', 'valid-B']
+    assert [row.receipt for row in failed] == [bad]
+    assert 'NOT NULL' in failed[0].error
+
+    stored = client.get(first.headers['Location'], headers=headers).get_json()
+    assert stored['status'] == 'stored' and stored['type'] == 'comment'
+    assert client.get(f'/writes/{bad}', headers=headers).get_json()['status'] == 'failed'
+    _, other = make_user('other')
+    assert client.get(first.headers['Location'], headers=other).status_code == 404
+
+
+def test_repeated_saves_keep_every_receipt(app, make_user, make_recipe):
+    user_id, headers = make_user('saver')
+    recipe_id = make_recipe(user_id)
+    client = app.test_client()
+    queue = app.extensions['write_behind']
+    first = client.post(f'/recipes/{recipe_id}/save', headers=headers)
+    queue.drain()
+    # A second save, both on its own and in the same batch as a third.
+    second = client.post(f'/recipes/{recipe_id}/save', headers=headers)
+    queue.drain()
+    third = client.post(f'/recipes/{recipe_id}/save', headers=headers)
+    fourth = client.post(f'/recipes/{recipe_id}/save', headers=headers)
+    queue.drain()
+
+    results = [client.get(r.headers['Location'], headers=headers).get_json() for r in (first, second, third, fourth)]
+    assert {r['status'] for r in results} == {'stored'}
+    assert len({r['save_id'] for r in results}) == 1
+    assert all(r['type'] == 'save' and r['recipe_id'] == recipe_id for r in results)
+
+
+def test_unsave_is_queued_behind_save(app, make_user, make_recipe):
+    user_id, headers = make_user('saver')
+    recipe_id = make_recipe(user_id)
+    client = app.test_client()
+    saved = client.post(f'/recipes/{recipe_id}/save', headers=headers)
+    unsaved = client.delete(f'/recipes/{recipe_id}/save', headers=headers)
+    assert saved.status_code == unsaved.status_code == 202
+    app.extensions['write_behind'].drain()
+
+    with app.app_context():
+        assert db.session.execute(db.select(Save)).first() is None
+    for response in (saved, unsaved):
+        assert client.get(response.headers['Location'], headers=headers).get_json()['status'] == 'deleted'
+
+    # Across batches too.
+    client.post(f'/recipes/{recipe_id}/save', headers=headers)
+    app.extensions['write_behind'].drain()
+    client.delete(f'/recipes/{recipe_id}/save', headers=headers)
+    app.extensions['write_behind'].drain()
+    with app.app_context():
+        assert db.session.execute(db.select(Save)).first() is None
+    assert client.delete('/recipes/999/save', headers=headers).status_code == 404
+
+
+def test_queued_saves_keep_receipts(app, make_user, make_recipe):
+    user_id, headers = make_user('saver')
+    recipe_id = make_recipe(user_id)
+    client = app.test_client()
+    response = client.post(f'/recipes/{recipe_id}/save', headers=headers)
+    assert response.status_code == 202
+    app.extensions['write_behind'].drain()
+
+    stored = client.get(f"/writes/{response.get_json()['id']}", headers=headers).get_json()
+    assert stored['status'] == 'stored' and stored['type'] == 'save' and stored['recipe_id'] == recipe_id